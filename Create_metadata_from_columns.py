@@ -3,16 +3,24 @@
 # =========================
 
 import pandas as pd
+import ast
+import hashlib
+import json
 import os
 import random
+from data.storage import MERGED_PATH, merged_columns
+from metadata_store import METADATA_PATH as METADATA_STORE_PATH, write_metadata
 
 # =========================
 # CONFIG
 # =========================
-CSV_PATH = "merged_output.csv"
 METADATA_PATH = "column_metadata.csv"
+CLASSIFIER_CACHE_PATH = "classifier_cache.json"
+LEGACY_CSV_PATH = "merged_output.csv"
 
-BUILD_METADATA = True  # ⚠️ poner False después de la primera corrida
+MODEL_NAME = "facebook/bart-large-mnli"
+CLASSIFIER_BATCH_SIZE = 16
+DEVICE = -1  # CPU
 
 DIMENSIONS = [
     "mental health",
@@ -28,15 +36,7 @@ DIMENSIONS = [
 MAX_COLS = 5  # número máximo de columnas a recomendar
 
 # =========================
-# 1️⃣ LOAD DATA
-# =========================
-print("Loading CSV...")
-df = pd.read_csv(CSV_PATH)
-metric_columns = [c for c in df.columns if c not in ["geo", "time"]]
-print(f"Found {len(metric_columns)} metric columns")
-
-# =========================
-# 2️⃣ UTILS
+# 1️⃣ UTILS
 # =========================
 def humanize(col):
     return (
@@ -47,29 +47,97 @@ def humanize(col):
            .strip()
     )
 
+
+def load_metric_columns():
+    """Solo nombres de columnas: schema del Parquet o, con el CSV antiguo, solo la cabecera"""
+    if os.path.exists(MERGED_PATH):
+        columns = merged_columns(MERGED_PATH)
+    else:
+        columns = pd.read_csv(LEGACY_CSV_PATH, nrows=0).columns.tolist()
+    return [c for c in columns if c not in ["geo", "time"]]
+
+
 # =========================
-# 3️⃣ BUILD METADATA (RUN ONCE)
+# 2️⃣ CLASSIFIER CACHE
 # =========================
-if BUILD_METADATA:
-    from transformers import pipeline
+def cache_key(text, labels=DIMENSIONS, model=MODEL_NAME):
+    """Clave = (texto humanizado, conjunto de etiquetas, modelo)"""
+    payload = json.dumps([text, sorted(labels), model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_cache(path=CLASSIFIER_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cache(cache, path=CLASSIFIER_CACHE_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def seed_cache_from_metadata(cache, path=METADATA_PATH):
+    """Reutiliza las clasificaciones ya guardadas en un metadata existente (top-3 etiquetas/scores)"""
+    if not os.path.exists(path):
+        return 0
+
+    seeded = 0
+    for row in pd.read_csv(path).itertuples(index=False):
+        key = cache_key(row.description)
+        if key in cache:
+            continue
+        secondary = ast.literal_eval(row.secondary_labels) if isinstance(row.secondary_labels, str) else list(row.secondary_labels)
+        scores = ast.literal_eval(row.all_confidences) if isinstance(row.all_confidences, str) else list(row.all_confidences)
+        cache[key] = {"labels": [row.primary_label] + list(secondary), "scores": [float(s) for s in scores]}
+        seeded += 1
+    return seeded
+
+
+def classify_missing(texts, cache):
+    """Clasifica solo los textos que no están en cache, en batches sobre CPU"""
+    missing = sorted({t for t in texts if cache_key(t) not in cache})
+    if not missing:
+        return 0
 
-    print("Building column metadata (this runs once)...")
+    from transformers import pipeline
 
     classifier = pipeline(
         "zero-shot-classification",
-        model="facebook/bart-large-mnli"
+        model=MODEL_NAME,
+        device=DEVICE
     )
 
+    for start in range(0, len(missing), CLASSIFIER_BATCH_SIZE):
+        batch = missing[start:start + CLASSIFIER_BATCH_SIZE]
+        results = classifier(
+            batch,
+            candidate_labels=DIMENSIONS,
+            multi_label=False,
+            batch_size=CLASSIFIER_BATCH_SIZE
+        )
+        for text, result in zip(batch, results):
+            cache[cache_key(text)] = {"labels": result["labels"], "scores": [float(s) for s in result["scores"]]}
+            print(f"✓ {text} → {result['labels'][0]} (confidence: {result['scores'][0]:.2f})")
+
+        # Guardar tras cada batch: si se corta, no se pierde lo ya clasificado
+        save_cache(cache)
+
+    return len(missing)
+
+
+# =========================
+# 3️⃣ BUILD METADATA
+# =========================
+def build_metadata(metric_columns, cache):
     metadata = []
 
     for col in metric_columns:
         text = humanize(col)
-
-        result = classifier(
-            text,
-            candidate_labels=DIMENSIONS,
-            multi_label=False
-        )
+        result = cache[cache_key(text)]
 
         metadata.append({
             "column": col,
@@ -82,8 +150,24 @@ if BUILD_METADATA:
             "tags": col.lower().split("_")  # para inferencia de intereses
         })
 
-        print(f"✓ {col} → {result['labels'][0]} (confidence: {result['scores'][0]:.2f})")
+    return pd.DataFrame(metadata)
+
+
+if __name__ == "__main__":
+    print("Loading columns...")
+    metric_columns = load_metric_columns()
+    print(f"Found {len(metric_columns)} metric columns")
+
+    cache = load_cache()
+    seeded = seed_cache_from_metadata(cache)
+    if seeded:
+        save_cache(cache)
+        print(f"Seeded {seeded} cached classifications from {METADATA_PATH}")
+
+    n_new = classify_missing([humanize(c) for c in metric_columns], cache)
+    print(f"Classified {n_new} new columns ({len(metric_columns) - n_new} from cache)")
 
-    meta_df = pd.DataFrame(metadata)
+    meta_df = build_metadata(metric_columns, cache)
     meta_df.to_csv(METADATA_PATH, index=False)
-    print("Metadata saved to", METADATA_PATH)
\ No newline at end of file
+    write_metadata(meta_df, METADATA_STORE_PATH)
+    print("Metadata saved to", METADATA_PATH, "and", METADATA_STORE_PATH)
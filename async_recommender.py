@@ -0,0 +1,175 @@
+import asyncio
+import pandas as pd
+from typing import Dict, List, Optional
+
+from data_sources import AsyncSupabaseDataSource, DataSource
+from metadata_store import ColumnMetadata
+from instrumentation import Instrumentation
+from ppp import (
+    MAX_COLS, MAX_REFILL_ROUNDS, MAX_YEAR, PREFERRED_START_YEAR, SUPABASE_KEY, SUPABASE_URL, VERBOSE,
+    SupabaseRecommender,
+)
+from quality_index import QualityIndex
+from cache import CountryDataCache
+from sampling import make_rng, new_seed
+
+# =========================
+# CONFIG
+# =========================
+SPECULATIVE_FALLBACK = False  # True -> consulta de rango ampliado especulativa (más carga en Supabase)
+SPECULATIVE_DELAY = 0.25  # segundos de espera a la consulta con ventana antes de lanzar la especulativa
+
+
+class AsyncSupabaseRecommender(SupabaseRecommender):
+    """
+    Versión asyncio de SupabaseRecommender.
+
+    Reutiliza el scoring, la selección y el análisis de calidad (en memoria)
+    y solo hace async el acceso a datos: una única fuente/cliente compartido
+    entre requests, la consulta de rango ampliado opcionalmente especulativa
+    y varios países consultados en paralelo.
+    """
+
+    def __init__(self, data_source: DataSource, quality_index: Optional[QualityIndex] = None,
+                 cache: Optional[CountryDataCache] = None, speculative_fallback: bool = SPECULATIVE_FALLBACK,
+                 metadata: Optional[ColumnMetadata] = None, instrumentation: Optional[Instrumentation] = None):
+        """
+        Args:
+            data_source: fuente con afetch() (AsyncSupabaseDataSource o LocalDataSource)
+            quality_index: estadísticas precalculadas por (geo, columna)
+            cache: cache LRU/TTL por (país, ventana, columna) delante de la fuente
+            speculative_fallback: si la consulta con ventana tarda más de
+                SPECULATIVE_DELAY, lanzar ya la consulta sin filtro de año en vez
+                de esperar a que falle (reduce la latencia de los países sin datos
+                recientes a costa de consultas extra y slots del semáforo)
+            metadata: metadata de columnas ya cargada
+            instrumentation: timers/contadores por request y modo silencioso
+        """
+        super().__init__(data_source, quality_index, cache, metadata, instrumentation)
+        self.speculative_fallback = speculative_fallback
+
+    @classmethod
+    async def create(cls, quality_index: Optional[QualityIndex] = None, cache: Optional[CountryDataCache] = None,
+                     max_concurrency: int = 16, instrumentation: Optional[Instrumentation] = None) -> "AsyncSupabaseRecommender":
+        """Crea el recomendador con un cliente async de Supabase"""
+        if instrumentation is None:
+            instrumentation = Instrumentation(verbose=VERBOSE)
+        instrumentation.log("🔌 Conectando a Supabase (async)...")
+        data_source = await AsyncSupabaseDataSource.create(
+            SUPABASE_URL, SUPABASE_KEY, max_concurrency=max_concurrency
+        )
+        return cls(data_source, quality_index, cache, instrumentation=instrumentation)
+
+    async def fetch_country_data_async(self, country_code: str, columns: List[str]) -> Optional[pd.DataFrame]:
+        """Obtiene datos de un país; la consulta de rango ampliado solo si hace falta (o especulativa)"""
+        fallback = None
+        try:
+            self.log(f"🔍 Consultando datos para '{country_code}'...")
+
+            windowed = asyncio.ensure_future(
+                self.data_source.afetch(country_code, columns, PREFERRED_START_YEAR, MAX_YEAR)
+            )
+            if self.speculative_fallback:
+                # En el caso habitual la ventana responde antes y no se lanza nada más
+                done, _ = await asyncio.wait({windowed}, timeout=SPECULATIVE_DELAY)
+                if not done:
+                    fallback = asyncio.ensure_future(self.data_source.afetch(country_code, columns))
+
+            df = await windowed
+            if df is not None and len(df) > 0:
+                self.log(f"   ✅ {len(df)} registros obtenidos")
+                return df
+
+            self.log(f"   ⚠️  No hay datos para '{country_code}' en rango {PREFERRED_START_YEAR}-{MAX_YEAR}")
+            self.log(f"   🔄 Intentando con rango ampliado...")
+            self.instrumentation.count("fallback_queries")
+            df = await (fallback if fallback is not None else self.data_source.afetch(country_code, columns))
+            fallback = None
+
+            if df is None or len(df) == 0:
+                self.log(f"   ❌ No hay datos para '{country_code}'")
+                return None
+
+            self.log(f"   ✅ {len(df)} registros obtenidos")
+            return df
+
+        except Exception as e:
+            self.log(f"   ❌ Error al consultar datos: {e}")
+            self.instrumentation.count("fetch_errors")
+            return None
+
+        finally:
+            # La consulta especulativa no se necesitó
+            if fallback is not None and not fallback.done():
+                fallback.cancel()
+
+    async def get_recommendations_async(self, country_code: str, user_scores: Dict[str, float],
+                                        country_aware: bool = True, interests: Optional[str] = None,
+                                        seed: Optional[int] = None) -> Optional[Dict]:
+        """Pipeline completo de recomendación (ver SupabaseRecommender.get_recommendations)"""
+        seed = new_seed() if seed is None else seed
+        rng = make_rng(seed)
+        with self.instrumentation.request(country=country_code.lower()):
+            with self.instrumentation.timer("score"):
+                scored_df = self.score_columns(user_scores, interests)
+            with self.instrumentation.timer("select"):
+                usable = self.usable_columns(country_code) if country_aware else None
+                selected_columns = self.select_columns(scored_df, rng=rng, usable=usable)
+
+            with self.instrumentation.timer("fetch"):
+                df_country = await self.fetch_country_data_async(country_code, selected_columns)
+            if df_country is None:
+                return None
+
+            with self.instrumentation.timer("quality"):
+                results = self._analyze_columns(df_country, selected_columns, country_code)
+
+            # Reponer columnas descartadas (ver SupabaseRecommender.get_recommendations)
+            tried = set(selected_columns)
+            rounds = MAX_REFILL_ROUNDS if usable is not None else 0
+            while rounds > 0 and len(results) < MAX_COLS:
+                rounds -= 1
+                remaining = scored_df[~scored_df["column"].isin(tried)]
+                with self.instrumentation.timer("select"):
+                    refill = self.select_columns(remaining, MAX_COLS - len(results), rng=rng, usable=usable)
+                if not refill:
+                    break
+
+                self.instrumentation.count("refill_queries")
+                tried.update(refill)
+                selected_columns = selected_columns + refill
+                with self.instrumentation.timer("fetch"):
+                    df_refill = await self.fetch_country_data_async(country_code, refill)
+                if df_refill is not None:
+                    with self.instrumentation.timer("quality"):
+                        results += self._analyze_columns(df_refill, refill, country_code)
+
+            with self.instrumentation.timer("summary"):
+                result = self._build_result(country_code, selected_columns, results)
+            if result is not None:
+                result['seed'] = seed
+            return result
+
+    async def compare_countries(self, country_codes: List[str], user_scores: Dict[str, float],
+                                country_aware: bool = True) -> Dict[str, Optional[Dict]]:
+        """Recomendaciones para varios países a la vez (consultas concurrentes)"""
+        results = await asyncio.gather(*[
+            self.get_recommendations_async(code, user_scores, country_aware)
+            for code in country_codes
+        ])
+        return dict(zip(country_codes, results))
+
+
+# =========================
+# EJEMPLO DE USO
+# =========================
+if __name__ == "__main__":
+    async def main():
+        recommender = await AsyncSupabaseRecommender.create(cache=CountryDataCache())
+        user_priorities = {"economy": 10, "environment": 10, "mental health": 10}
+        comparison = await recommender.compare_countries(["esp", "fra", "deu"], user_priorities)
+        for country, result in comparison.items():
+            if result:
+                recommender.print_results(result)
+
+    asyncio.run(main())
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import (
+    LatencyDataSource, geo_codes, make_merged, make_metadata, make_profiles, write_indicator_files,
+)
+from data.df_db import clean_for_json, serialize_rows
+from data.merge import load_and_merge_folder
+from data_sources import LocalDataSource
+from instrumentation import Instrumentation
+from metadata_store import ColumnMetadata
+from ppp import MAX_COLS, TOP_N_FOR_RANDOM, SupabaseRecommender
+from quality_index import QualityIndex, build_quality_index
+from sampling import gumbel_top_k
+
+# =========================
+# CONFIG
+# =========================
+RESULTS_PATH = "benchmark_results.json"
+STAGES = ["score", "select", "fetch", "quality"]
+
+N_COUNTRIES = 200
+N_YEARS = 60
+N_INDICATORS = 500
+N_REQUESTS = 200
+LATENCY = 0.0  # segundos simulados por consulta a la fuente
+BATCH_PROFILES = 4  # perfiles por llamada a get_recommendations_batch (todos los países)
+INGEST_INDICATORS = 100
+INGEST_REPEATS = 3
+SEED = 42
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Resumen de latencias (en ms) y throughput de una lista de duraciones en segundos"""
+    arr = np.asarray(samples, dtype=np.float64)
+    if len(arr) == 0:
+        return {"n": 0}
+    total = float(arr.sum())
+    return {
+        "n": int(len(arr)),
+        "total_s": total,
+        "mean_ms": float(arr.mean() * 1000),
+        "p50_ms": float(np.percentile(arr, 50) * 1000),
+        "p99_ms": float(np.percentile(arr, 99) * 1000),
+        "max_ms": float(arr.max() * 1000),
+        "throughput_per_s": len(arr) / total if total > 0 else None,
+    }
+
+
+def repeat(fn: Callable, repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_recommender(n_countries: int = N_COUNTRIES, n_years: int = N_YEARS, n_indicators: int = N_INDICATORS,
+                      n_requests: int = N_REQUESTS, latency: float = LATENCY, use_quality_index: bool = True,
+                      seed: int = SEED) -> Dict:
+    """
+    Latencia por etapa del pipeline de SupabaseRecommender sobre datos sintéticos.
+
+    Las etapas se miden como en get_recommendations (sin la reposición de
+    columnas descartadas); además se mide get_recommendations completo.
+    """
+    setup = {}
+
+    t0 = time.perf_counter()
+    merged = make_merged(n_countries, n_years, n_indicators, seed=seed)
+    columns = [c for c in merged.columns if c not in ("geo", "time")]
+    metadata = ColumnMetadata.from_frame(make_metadata(columns, seed))
+    setup["synthetic_data_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    quality_index = QualityIndex(build_quality_index(merged, columns)) if use_quality_index else None
+    setup["quality_index_s"] = time.perf_counter() - t0
+
+    source = LatencyDataSource(LocalDataSource(merged), latency)
+    instrumentation = Instrumentation(verbose=False)
+    recommender = SupabaseRecommender(source, quality_index, metadata=metadata, instrumentation=instrumentation)
+
+    rng = np.random.default_rng(seed)
+    profiles = make_profiles(n_requests, seed)
+    geos = rng.choice(geo_codes(n_countries), size=n_requests)
+
+    samples = {stage: [] for stage in STAGES}
+    end_to_end = []
+    returned_columns = []
+
+    for profile, geo in zip(profiles, geos):
+        t0 = time.perf_counter()
+        scored = recommender.score_columns(profile)
+        t1 = time.perf_counter()
+        selected = recommender.select_columns(scored, country_code=geo, rng=rng)
+        t2 = time.perf_counter()
+        df = recommender.fetch_country_data(geo, selected)
+        t3 = time.perf_counter()
+        results = recommender._analyze_columns(df, selected, geo) if df is not None else []
+        t4 = time.perf_counter()
+
+        samples["score"].append(t1 - t0)
+        samples["select"].append(t2 - t1)
+        samples["fetch"].append(t3 - t2)
+        samples["quality"].append(t4 - t3)
+        returned_columns.append(len(results))
+
+    source.calls = 0
+    instrumentation.reset()
+    for i, (profile, geo) in enumerate(zip(profiles, geos)):
+        t0 = time.perf_counter()
+        recommender.get_recommendations(geo, profile, seed=seed + i)
+        end_to_end.append(time.perf_counter() - t0)
+
+    # Batch: todos los países × BATCH_PROFILES perfiles en una llamada
+    single_calls = source.calls
+    batch_profiles = profiles[:BATCH_PROFILES]
+    source.calls = 0
+    t0 = time.perf_counter()
+    recommender.get_recommendations_batch(geo_codes(n_countries), batch_profiles, seed=seed)
+    batch_s = time.perf_counter() - t0
+
+    # Muestreo vectorizado de todas las requests en una sola llamada
+    scores = recommender.scoring.score_batch(profiles)
+    t0 = time.perf_counter()
+    gumbel_top_k(scores, MAX_COLS, rng, top_n=TOP_N_FOR_RANDOM)
+    sampling_s = time.perf_counter() - t0
+
+    return {
+        "params": {
+            "n_countries": n_countries, "n_years": n_years, "n_indicators": n_indicators,
+            "n_requests": n_requests, "latency_s": latency, "quality_index": use_quality_index,
+        },
+        "setup": setup,
+        "stages": {stage: summarize(values) for stage, values in samples.items()},
+        "get_recommendations": summarize(end_to_end),
+        "get_recommendations_counters": instrumentation.stats()["counters"],
+        "get_recommendations_batch": {
+            "countries": n_countries,
+            "profiles": len(batch_profiles),
+            "total_s": batch_s,
+            "per_result_ms": batch_s * 1000 / max(1, n_countries * len(batch_profiles)),
+            "queries": source.calls,
+        },
+        "batched_sampling": {
+            "requests": n_requests,
+            "total_s": sampling_s,
+            "requests_per_s": n_requests / sampling_s if sampling_s > 0 else None,
+        },
+        "fetches_per_request": single_calls / n_requests if n_requests else 0.0,
+        "mean_columns_returned": float(np.mean(returned_columns)) if returned_columns else 0.0,
+    }
+
+
+def bench_ingest(n_countries: int = N_COUNTRIES, n_years: int = N_YEARS, n_indicators: int = INGEST_INDICATORS,
+                 repeats: int = INGEST_REPEATS, seed: int = SEED) -> Dict:
+    """Tiempos de load_and_merge_folder (serie y en paralelo), clean_for_json y serialize_rows"""
+    merged = make_merged(n_countries, n_years, n_indicators, seed=seed)
+    folder = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        write_indicator_files(folder, merged)
+        result = {
+            "params": {
+                "n_countries": n_countries, "n_years": n_years, "n_indicators": n_indicators,
+                "rows": len(merged), "repeats": repeats,
+            },
+            "load_and_merge_folder_serial": summarize(repeat(lambda: load_and_merge_folder(folder, workers=1), repeats)),
+            "load_and_merge_folder_parallel": summarize(repeat(lambda: load_and_merge_folder(folder), repeats)),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    result["clean_for_json"] = summarize(repeat(lambda: clean_for_json(merged), repeats))
+    result["serialize_rows"] = summarize(repeat(lambda: serialize_rows(merged), repeats))
+    return result
+
+
+def run(path: str = RESULTS_PATH, n_countries: int = N_COUNTRIES, n_years: int = N_YEARS,
+        n_indicators: int = N_INDICATORS, n_requests: int = N_REQUESTS, latency: float = LATENCY,
+        use_quality_index: bool = True, ingest_indicators: int = INGEST_INDICATORS,
+        ingest_repeats: int = INGEST_REPEATS) -> Dict:
+    """Ejecuta todos los benchmarks y guarda los resultados en JSON"""
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "recommender": bench_recommender(n_countries, n_years, n_indicators, n_requests, latency, use_quality_index),
+        "ingest": bench_ingest(n_countries, n_years, ingest_indicators, ingest_repeats),
+    }
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de recomendación y de ingesta")
+    parser.add_argument("--countries", type=int, default=N_COUNTRIES)
+    parser.add_argument("--years", type=int, default=N_YEARS)
+    parser.add_argument("--indicators", type=int, default=N_INDICATORS)
+    parser.add_argument("--requests", type=int, default=N_REQUESTS)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="segundos simulados por consulta")
+    parser.add_argument("--no-quality-index", action="store_true")
+    parser.add_argument("--ingest-indicators", type=int, default=INGEST_INDICATORS)
+    parser.add_argument("--ingest-repeats", type=int, default=INGEST_REPEATS)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    results = run(
+        args.output,
+        n_countries=args.countries, n_years=args.years, n_indicators=args.indicators,
+        n_requests=args.requests, latency=args.latency, use_quality_index=not args.no_quality_index,
+        ingest_indicators=args.ingest_indicators, ingest_repeats=args.ingest_repeats,
+    )
+
+    print(f"{'stage':<32}{'p50 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    rows = {**results["recommender"]["stages"], "get_recommendations": results["recommender"]["get_recommendations"]}
+    rows.update({k: v for k, v in results["ingest"].items() if k != "params"})
+    for name, stats in rows.items():
+        if stats.get("n"):
+            print(f"{name:<32}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['throughput_per_s']:>10.1f}")
+    print(f"\nResults saved to {args.output}")
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+import numpy as np
+import pandas as pd
+from typing import List
+
+from dimensions import DIMENSIONS
+from data_sources import DataSource
+
+# =========================
+# CONFIG
+# =========================
+FIRST_YEAR = 1960
+SEED = 42
+
+
+def geo_codes(n_countries: int) -> List[str]:
+    return [f"c{i:03d}" for i in range(n_countries)]
+
+
+def indicator_names(n_indicators: int) -> List[str]:
+    return [f"indicator_{i:04d}" for i in range(n_indicators)]
+
+
+def make_merged(n_countries: int, n_years: int, n_indicators: int,
+                missing_rate: float = 0.4, seed: int = SEED) -> pd.DataFrame:
+    """
+    Tabla merged sintética (geo, time, indicadores) con huecos realistas.
+
+    Cada (país, indicador) empieza a tener datos en un año aleatorio y después
+    pierde celdas sueltas con probabilidad `missing_rate`, así hay columnas
+    completas, columnas que no pasan MIN_COMPLETENESS y columnas vacías.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = n_countries * n_years
+
+    geo = np.repeat(geo_codes(n_countries), n_years)
+    years = np.tile(np.arange(FIRST_YEAR, FIRST_YEAR + n_years), n_countries)
+
+    first_year = rng.integers(0, n_years + 1, size=(n_countries, n_indicators))
+    year_pos = np.tile(np.arange(n_years), n_countries)[:, None]
+    covered = year_pos >= np.repeat(first_year, n_years, axis=0)
+    present = covered & (rng.random((n_rows, n_indicators)) >= missing_rate)
+
+    values = rng.lognormal(mean=2.0, sigma=1.5, size=(n_rows, n_indicators))
+    values[~present] = np.nan
+
+    df = pd.DataFrame(values, columns=indicator_names(n_indicators))
+    df.insert(0, "time", years)
+    df.insert(0, "geo", geo)
+    return df
+
+
+def make_metadata(columns: List[str], seed: int = SEED) -> pd.DataFrame:
+    """Metadata con el formato de column_metadata para columnas sintéticas"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for col in columns:
+        labels = list(rng.permutation(DIMENSIONS)[:3])
+        scores = np.sort(rng.dirichlet(np.ones(len(DIMENSIONS))))[::-1][:3]
+        rows.append({
+            "column": col,
+            "primary_label": labels[0],
+            "secondary_labels": labels[1:3],
+            "confidence": float(scores[0]),
+            "all_confidences": [float(s) for s in scores],
+            "description": col.replace("_", " "),
+            "unit": "count",
+            "tags": col.split("_"),
+        })
+    return pd.DataFrame(rows)
+
+
+def make_profiles(n_profiles: int, seed: int = SEED) -> List[dict]:
+    """Prioridades de usuario aleatorias sobre las dimensiones del clasificador"""
+    rng = np.random.default_rng(seed)
+    return [
+        {dim: float(v) for dim, v in zip(DIMENSIONS, rng.integers(0, 11, size=len(DIMENSIONS)))}
+        for _ in range(n_profiles)
+    ]
+
+
+def write_indicator_files(folder: str, merged: pd.DataFrame, gender_every: int = 5) -> List[str]:
+    """
+    Escribe un CSV de indicador por columna (formato de datapoints de Gapminder).
+
+    Uno de cada `gender_every` archivos se parte en filas gender 0/1 para
+    ejercitar la suma por sexo de read_indicator_file.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, col in enumerate(c for c in merged.columns if c not in ("geo", "time")):
+        part = merged[["geo", "time", col]].dropna(subset=[col])
+        if gender_every and i % gender_every == 0:
+            half = part.assign(**{col: part[col] / 2})
+            part = pd.concat([half.assign(gender=0), half.assign(gender=1)])[["geo", "time", "gender", col]]
+        path = os.path.join(folder, f"ddf--datapoints--{col}--by--geo--time.csv")
+        part.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+class LatencyDataSource(DataSource):
+    """Envuelve una fuente local y simula la latencia de red de cada consulta"""
+
+    def __init__(self, source: DataSource, latency: float = 0.0):
+        self.source = source
+        self.latency = latency
+        self.calls = 0
+
+    def local_source(self):
+        return self.source.local_source()
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.source.fetch(country_code, columns, start_year, end_year)
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.source.fetch_many(country_codes, columns, start_year, end_year)
+
+    async def afetch(self, country_code, columns, start_year=None, end_year=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.source.fetch(country_code, columns, start_year, end_year)
@@ -0,0 +1,187 @@
+import threading
+import time
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from data_sources import DataSource
+
+# =========================
+# CONFIG
+# =========================
+CACHE_MAX_ENTRIES = 20000  # entradas (país, ventana, columna)
+CACHE_TTL = 3600  # segundos
+
+
+class CountryDataCache:
+    """
+    Cache LRU con TTL de datos por país.
+
+    Cada entrada es una columna de un país en una ventana de años
+    (geo, start_year, end_year, column) -> Serie indexada por 'time', así una
+    consulta por A,B,C reutiliza A y B ya cacheadas y solo pide C.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL,
+                 data_version: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data_version = data_version
+        self._entries: "OrderedDict[Tuple, Tuple[float, pd.Series]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(country_code: str, start_year: Optional[int], end_year: Optional[int], column: str) -> Tuple:
+        return (country_code.lower(), start_year, end_year, column)
+
+    def get(self, country_code: str, columns: List[str], start_year: Optional[int] = None,
+            end_year: Optional[int] = None) -> Tuple[Dict[str, pd.Series], List[str]]:
+        """Devuelve (series cacheadas por columna, columnas que faltan)"""
+        found, missing = {}, []
+        now = time.monotonic()
+
+        with self._lock:
+            for col in columns:
+                key = self._key(country_code, start_year, end_year, col)
+                entry = self._entries.get(key)
+
+                if entry is not None and now - entry[0] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+
+                if entry is None:
+                    missing.append(col)
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    found[col] = entry[1]
+                    self.hits += 1
+
+        return found, missing
+
+    def put(self, country_code: str, series: Dict[str, pd.Series], start_year: Optional[int] = None,
+            end_year: Optional[int] = None):
+        """Guarda series por columna, expulsando las menos usadas recientemente"""
+        now = time.monotonic()
+
+        with self._lock:
+            for col, values in series.items():
+                key = self._key(country_code, start_year, end_year, col)
+                self._entries[key] = (now, values)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, country_code: Optional[str] = None):
+        """Borra todo el cache o solo las entradas de un país"""
+        with self._lock:
+            if country_code is None:
+                self._entries.clear()
+                return
+            geo = country_code.lower()
+            for key in [k for k in self._entries if k[0] == geo]:
+                del self._entries[key]
+
+    def set_data_version(self, version: str):
+        """Hook para cuando se sube un nuevo batch: si la versión cambia, se vacía el cache"""
+        if version != self.data_version:
+            self.invalidate()
+            self.data_version = version
+
+    def stats(self) -> Dict:
+        """Contadores de hit/miss para dimensionar el cache"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'data_version': self.data_version,
+        }
+
+
+class CachedDataSource(DataSource):
+    """Envuelve otra fuente y solo le pide las columnas que no están en cache"""
+
+    def __init__(self, source: DataSource, cache: CountryDataCache):
+        self.source = source
+        self.cache = cache
+        self.supports_sync = source.supports_sync
+
+    def local_source(self):
+        return self.source.local_source()
+
+    @staticmethod
+    def _split(df: Optional[pd.DataFrame], columns: List[str]) -> Dict[str, pd.Series]:
+        """Separa la respuesta en series por columna (vacías si no hubo filas)"""
+        if df is None or len(df) == 0:
+            empty = pd.Series([], index=pd.Index([], name='time'), dtype=float)
+            return {col: empty for col in columns}
+
+        indexed = df.set_index('time')
+        return {col: indexed[col] for col in columns if col in indexed.columns}
+
+    @staticmethod
+    def _combine(country_code: str, columns: List[str], series: Dict[str, pd.Series]) -> Optional[pd.DataFrame]:
+        present = {col: series[col] for col in columns if col in series and len(series[col]) > 0}
+        if not present:
+            return None
+
+        df = pd.DataFrame(present).sort_index()
+        df.index.name = 'time'
+        df = df.reset_index()
+        df.insert(0, 'geo', country_code.lower())
+        return df
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        found, missing = self.cache.get(country_code, columns, start_year, end_year)
+        if missing:
+            fetched = self._split(self.source.fetch(country_code, missing, start_year, end_year), missing)
+            self.cache.put(country_code, fetched, start_year, end_year)
+            found.update(fetched)
+        return self._combine(country_code, columns, found)
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        """Los países con columnas fuera de cache se piden juntos en una sola consulta"""
+        found = {}
+        pending, pending_columns = [], set()
+        for code in country_codes:
+            found[code], missing = self.cache.get(code, columns, start_year, end_year)
+            if missing:
+                pending.append(code)
+                pending_columns.update(missing)
+
+        if pending:
+            missing_columns = [c for c in columns if c in pending_columns]
+            df = self.source.fetch_many(pending, missing_columns, start_year, end_year)
+            groups = {} if df is None else {geo: part for geo, part in df.groupby('geo', sort=False)}
+            for code in pending:
+                fetched = self._split(groups.get(code.lower()), missing_columns)
+                self.cache.put(code, fetched, start_year, end_year)
+                found[code].update(fetched)
+
+        frames = [self._combine(code, columns, found[code]) for code in country_codes]
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    async def afetch(self, country_code, columns, start_year=None, end_year=None):
+        found, missing = self.cache.get(country_code, columns, start_year, end_year)
+        if missing:
+            df = await self.source.afetch(country_code, missing, start_year, end_year)
+            fetched = self._split(df, missing)
+            self.cache.put(country_code, fetched, start_year, end_year)
+            found.update(fetched)
+        return self._combine(country_code, columns, found)
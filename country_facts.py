@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from indicator_stats import trend_matrices
+from metadata_store import ColumnMetadata
+from quality_index import MIN_COMPLETENESS, MIN_POINTS, quality_matrices, sorted_by_geo_time
+
+# =========================
+# CONFIG
+# =========================
+BUNDLE_DIR = "country_facts"  # se sirve tal cual como estático junto al mapa
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = 1  # subir si cambia la estructura de los archivos
+PREFERRED_START_YEAR = 2000
+MAX_YEAR = 2025
+FACTS_PER_DIMENSION = 3  # indicadores curados por etiqueta primaria
+SIGNIFICANT_DIGITS = 6  # redondeo de valores y pendientes en el bundle
+
+FIELDS = ["latest_year", "latest_value", "trend", "completeness", "usable"]
+
+
+def select_fact_columns(
+    df: pd.DataFrame,
+    metadata: ColumnMetadata,
+    per_dimension: int = FACTS_PER_DIMENSION,
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+) -> List[str]:
+    """
+    Elige el set curado de indicadores, el mismo para todos los países.
+
+    Por cada etiqueta primaria se toman las `per_dimension` columnas con datos
+    usables en más países (a igualdad, mayor confidence del clasificador).
+    """
+    columns = [c for c in metadata.columns if c in df.columns]
+    if not columns:
+        return []
+
+    q = quality_matrices(sorted_by_geo_time(df), columns, start_year, end_year, MIN_COMPLETENESS, MIN_POINTS)
+    coverage = q["usable"].mean(axis=0)
+
+    ids = np.array([metadata.column_index[c] for c in columns])
+    primary = metadata.primary[ids]
+    confidence = metadata.confidence[ids]
+
+    selected = []
+    for label in range(len(metadata.labels)):
+        idx = np.flatnonzero((primary == label) & (coverage > 0))
+        order = np.lexsort((-confidence[idx], -coverage[idx]))
+        selected.extend(columns[i] for i in idx[order[:per_dimension]])
+    return selected
+
+
+def compute_facts(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+) -> Dict:
+    """
+    Hechos por (geo, indicador) sobre la tabla merged (ver indicator_stats.trend_matrices).
+
+    - latest_year / latest_value: último dato no nulo hasta end_year
+    - trend: pendiente (unidades por año, mínimos cuadrados) sobre la ventana
+      preferida; misma ventana que analyze_column_quality
+    - completeness / usable: como en el quality index
+
+    Returns:
+        {"geos": array de códigos, "columns": lista, campo: matriz (n_geos, n_columnas)}
+    """
+    stats = trend_matrices(df, columns, start_year, end_year)
+    return {
+        "geos": stats["geos"],
+        "columns": stats["columns"],
+        "latest_year": stats["latest_year"],
+        "latest_value": stats["latest_value"],
+        "trend": stats["slope"],
+        "completeness": stats["completeness"],
+        "usable": stats["usable"],
+    }
+
+
+def _round(x: float) -> Optional[float]:
+    if not np.isfinite(x):
+        return None
+    return float(f"{x:.{SIGNIFICANT_DIGITS}g}")
+
+
+def country_snapshot(facts: Dict, g: int) -> Dict:
+    """Snapshot columnar de un país; cada lista va alineada con 'indicators' del manifest"""
+    return {
+        "geo": str(facts["geos"][g]),
+        "latest_year": [None if np.isnan(y) else int(y) for y in facts["latest_year"][g]],
+        "latest_value": [_round(x) for x in facts["latest_value"][g]],
+        "trend": [_round(x) for x in facts["trend"][g]],
+        "completeness": [round(float(x), 3) for x in facts["completeness"][g]],
+        "usable": [int(x) for x in facts["usable"][g]],
+    }
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _write_atomic(path: str, payload: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(bundle_dir: str = BUNDLE_DIR) -> Optional[Dict]:
+    path = os.path.join(bundle_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_bundle(facts: Dict, metadata: Optional[ColumnMetadata] = None, bundle_dir: str = BUNDLE_DIR,
+                 prune: bool = True, drop: Sequence[str] = ()) -> Dict:
+    """
+    Escribe el bundle: un JSON compacto por país (<geo>.json) más manifest.json.
+
+    Solo se reescriben los países cuyo contenido cambió (hash sha256 en el
+    manifest). Con prune=True se borran los países que no están en facts; con
+    prune=False (incremental) se conservan los demás salvo los de `drop`
+    (países que ya no existen en la tabla merged).
+    El manifest lista los indicadores en orden, el hash de cada país (para
+    usarlo como cache-buster: <geo>.json?v=<hash>) y una versión global que
+    cambia si cambia cualquier archivo.
+
+    Returns:
+        {"written": n, "unchanged": n, "removed": n, "version": str}
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    previous = load_manifest(bundle_dir) or {}
+    same_layout = (previous.get("format") == BUNDLE_FORMAT
+                   and [i["column"] for i in previous.get("indicators", [])] == list(facts["columns"]))
+    old_hashes = previous.get("countries", {}) if same_layout else {}
+
+    hashes, written = {}, 0
+    for g, geo in enumerate(facts["geos"]):
+        payload = _dumps(country_snapshot(facts, g))
+        digest = hashlib.sha256(payload).hexdigest()[:16]
+        path = os.path.join(bundle_dir, f"{geo}.json")
+        if old_hashes.get(geo) != digest or not os.path.exists(path):
+            _write_atomic(path, payload)
+            written += 1
+        hashes[str(geo)] = digest
+
+    # Incremental: países de la corrida anterior que no se recalcularon se conservan
+    if not prune:
+        for geo, digest in old_hashes.items():
+            if geo not in drop:
+                hashes.setdefault(geo, digest)
+
+    removed = 0
+    for geo in set(previous.get("countries", {})) - set(hashes):
+        path = os.path.join(bundle_dir, f"{geo}.json")
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    indicators = []
+    for col in facts["columns"]:
+        entry = {"column": col}
+        if metadata is not None and col in metadata.column_index:
+            i = metadata.column_index[col]
+            entry.update({
+                "label": metadata.labels[metadata.primary[i]] if metadata.primary[i] >= 0 else None,
+                "description": metadata.descriptions[i],
+                "unit": metadata.units[i],
+            })
+        indicators.append(entry)
+
+    countries = dict(sorted(hashes.items()))
+    version = hashlib.sha256(_dumps([indicators, countries])).hexdigest()[:16]
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "window": [PREFERRED_START_YEAR, MAX_YEAR],
+        "fields": FIELDS,
+        "indicators": indicators,
+        "countries": countries,
+    }
+    _write_atomic(os.path.join(bundle_dir, MANIFEST_NAME), _dumps(manifest))
+
+    return {"written": written, "unchanged": len(facts["geos"]) - written, "removed": removed, "version": version}
+
+
+# Ejecutar desde la raíz del repo tras reconstruir la tabla merged
+if __name__ == "__main__":
+    from data.merge import CHANGES_PATH, DELETES_PATH
+    from data.storage import MERGED_PATH, merged_columns, read_merged
+    from metadata_store import load_metadata
+
+    metadata = load_metadata()
+    manifest = load_manifest()
+    available = set(merged_columns(MERGED_PATH))
+
+    # El set curado se mantiene entre corridas mientras sus columnas sigan existiendo
+    columns = [i["column"] for i in manifest["indicators"]] if manifest else []
+    if not columns or not set(columns) <= available:
+        print("Selecting curated indicators...")
+        columns = select_fact_columns(read_merged(MERGED_PATH, columns=[c for c in metadata.columns if c in available]),
+                                      metadata)
+        geos = None
+    elif os.path.exists(CHANGES_PATH):
+        # Países con filas cambiadas o con celdas borradas en la última corrida de data.merge
+        changed = set(read_merged(CHANGES_PATH, columns=[])["geo"].str.lower())
+        if os.path.exists(DELETES_PATH):
+            changed |= set(pd.read_parquet(DELETES_PATH, columns=["geo"])["geo"].astype(str).str.lower())
+        geos = sorted(changed)
+    else:
+        geos = None
+
+    df = read_merged(MERGED_PATH, columns=columns, geos=geos)
+    facts = compute_facts(df, columns)
+
+    # Países que ya no están en la tabla merged: se quitan del bundle también en modo incremental
+    drop = []
+    if geos is not None:
+        present = set(read_merged(MERGED_PATH, columns=[])["geo"].str.lower())
+        drop = [geo for geo in manifest["countries"] if geo not in present]
+    stats = write_bundle(facts, metadata, prune=geos is None, drop=drop)
+    print(f"Country facts saved to {BUNDLE_DIR}/ ({len(columns)} indicators, "
+          f"{stats['written']} written, {stats['unchanged']} unchanged, {stats['removed']} removed, "
+          f"version {stats['version']})")
@@ -1,69 +1,394 @@
 import pandas as pd
-from supabase import create_client
+import json
 import math
+import os
+import random
+import threading
 import time
 import numpy as np
+import pyarrow.parquet as pq
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+from data.storage import MERGED_PATH as FULL_MERGED_PATH, read_merged, to_long, year_spans
 
 SUPABASE_URL = ""
 SUPABASE_KEY = ""
 
 TABLE_NAME = "Countries datapoints"
-CSV_PATH = "merged_output.csv"
+LONG_TABLE_NAME = "country_datapoints_long"  # geo, time, indicator, value
+SPANS_TABLE_NAME = "country_year_spans"  # geo, first_year, last_year (años de cada país en la tabla ancha)
+UPLOAD_FORMAT = "wide"  # "long" -> solo se suben las celdas con dato a LONG_TABLE_NAME
+MERGED_PATH = "merged_output.parquet"  # o "merged_changes.parquet" tras un rebuild incremental (data/merge.py)
+DELETES_PATH = "merged_deletes.parquet"  # borrados del último rebuild incremental (se aplican antes de subir)
+CHECKPOINT_PATH = "upload_checkpoint.json"
 
-BATCH_SIZE = 500
-SLEEP_BETWEEN = 0.2
+# Tamaño de batch: se ajusta al peso de las filas (~500 columnas) para acercarse a TARGET_PAYLOAD_BYTES
+BATCH_SIZE = None  # None -> auto; un entero fuerza el tamaño
+TARGET_PAYLOAD_BYTES = 2_000_000
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 2000
+SAMPLE_ROWS = 200
 
-START_BATCH = 146
+MAX_WORKERS = 4  # batches subiendo en paralelo
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # segundos, se duplica en cada reintento
 
 
 def clean_for_json(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza geo/time y convierte inf/-inf a NaN columna a columna.
+
+    No crea una copia object de la tabla: los nulos se omiten al serializar.
+    """
     # Asegura que geo/time existen
-    df = df.dropna(subset=["geo", "time"]).copy()
+    df = df.dropna(subset=["geo", "time"])
 
     # Normaliza tipos base
+    time_values = pd.to_numeric(df["time"], errors="coerce")
+    df = df[time_values.notna()].copy()
     df["geo"] = df["geo"].astype(str).str.strip()
-    df["time"] = pd.to_numeric(df["time"], errors="coerce")
-    df = df.dropna(subset=["time"]).copy()
-    df["time"] = df["time"].astype(int)
-
-    # Convierte inf/-inf a NaN, luego NaN -> None
-    df = df.replace([np.inf, -np.inf], np.nan)
+    df["time"] = time_values[time_values.notna()].astype(np.int64)
 
-    df = df.astype(object).where(pd.notnull(df), None)
+    # Convierte inf/-inf a NaN solo en columnas float
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col].dtype):
+            values = df[col].to_numpy()
+            if not np.isfinite(values[~np.isnan(values)]).all():
+                df[col] = np.where(np.isinf(values), np.nan, values)
 
     return df
 
 
-def main():
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _value_fragments(df: pd.DataFrame, columns: List[str]):
+    """
+    Fragmentos JSON '"col":valor' de las celdas no nulas, agrupados por tipo de columna.
+
+    Returns:
+        (filas, fragmentos) de todas las celdas con dato
+    """
+    rows_parts, frag_parts = [], []
+    floats = [c for c in columns if pd.api.types.is_float_dtype(df[c].dtype)]
+    ints = [c for c in columns if pd.api.types.is_integer_dtype(df[c].dtype) and not pd.api.types.is_bool_dtype(df[c].dtype)]
+    others = [c for c in columns if c not in set(floats) | set(ints)]
+
+    if floats:
+        values = df[floats].to_numpy(dtype=np.float64)
+        rows, cols = np.nonzero(np.isfinite(values))
+        prefixes = np.array([json.dumps(c) + ":" for c in floats], dtype=object)
+        # repr de float es JSON válido para valores finitos y mucho más rápido que astype(str)
+        texts = map(float.__repr__, values[rows, cols].tolist())
+        rows_parts.append(rows)
+        frag_parts.append(np.array(list(map(str.__add__, prefixes[cols].tolist(), texts)), dtype=object))
+
+    for c in ints:
+        # Columnas enteras (también nullable Int64) se serializan sin decimales
+        series = df[c]
+        mask = series.notna().to_numpy()
+        rows = np.flatnonzero(mask)
+        prefix = json.dumps(c) + ":"
+        rows_parts.append(rows)
+        frag_parts.append(np.array([prefix + str(v) for v in series[mask].astype(np.int64).tolist()], dtype=object))
+
+    for c in others:
+        series = df[c]
+        mask = series.notna().to_numpy()
+        rows = np.flatnonzero(mask)
+        prefix = json.dumps(c) + ":"
+        rows_parts.append(rows)
+        frag_parts.append(np.array(
+            [prefix + json.dumps(v, ensure_ascii=False, default=str) for v in series[mask]], dtype=object
+        ))
 
-    df = pd.read_csv(CSV_PATH, low_memory=False)
+    if not rows_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
 
+    rows = np.concatenate(rows_parts)
+    frags = np.concatenate(frag_parts)
+    order = np.argsort(rows, kind="stable")
+    return rows[order], frags[order]
+
+
+def serialize_rows(df: pd.DataFrame) -> bytes:
+    """
+    Serializa un chunk ancho a un array JSON compacto, omitiendo las claves nulas.
+
+    Las celdas se formatean por columna con NumPy; solo se recorre en Python la
+    lista de celdas con dato para unirlas por fila.
+    """
     df = clean_for_json(df)
+    n = len(df)
+    if n == 0:
+        return b"[]"
+
+    metric_cols = [c for c in df.columns if c not in ("geo", "time")]
+    rows, frags = _value_fragments(df, metric_cols)
+    bounds = np.searchsorted(rows, np.arange(n + 1))
+
+    heads = [
+        '{"geo":' + json.dumps(g, ensure_ascii=False) + ',"time":' + str(t)
+        for g, t in zip(df["geo"].tolist(), df["time"].tolist())
+    ]
+    objects = [
+        head + ("," + ",".join(frags[bounds[i]:bounds[i + 1]]) if bounds[i + 1] > bounds[i] else "") + "}"
+        for i, head in enumerate(heads)
+    ]
+    return ("[" + ",".join(objects) + "]").encode("utf-8")
+
+
+def serialize_long(df: pd.DataFrame) -> bytes:
+    """Serializa un chunk ancho como registros largos (geo, time, indicator, value)"""
+    df = df.dropna(subset=["geo", "time"])
+    long_df, indicators = to_long(df, value_dtype=np.float64)
+    if len(long_df) == 0:
+        return b"[]"
+
+    names = np.array([json.dumps(c) for c in indicators], dtype=object)
+    geos = np.array([json.dumps(g.strip()) for g in long_df["geo"].cat.categories], dtype=object)
+    objects = [
+        f'{{"geo":{g},"time":{t},"indicator":{ind},"value":{v!r}}}'
+        for g, t, ind, v in zip(
+            geos[long_df["geo"].cat.codes.to_numpy()].tolist(), long_df["time"].tolist(),
+            names[long_df["indicator"].to_numpy()].tolist(), long_df["value"].tolist()
+        )
+    ]
+    return ("[" + ",".join(objects) + "]").encode("utf-8")
+
+
+def _columns_of(path: str) -> List[str]:
+    return pq.read_schema(path).names
+
+
+# Formato de subida -> (tabla, clave de upsert, serialización de un chunk, columnas del payload)
+UPLOAD_FORMATS: Dict[str, tuple] = {
+    "wide": (TABLE_NAME, "geo,time", serialize_rows, _columns_of),
+    "long": (LONG_TABLE_NAME, "geo,time,indicator", serialize_long, lambda path: ["geo", "time", "indicator", "value"]),
+}
+
+
+def auto_batch_size(path: str, serialize: Callable[[pd.DataFrame], bytes] = serialize_rows) -> int:
+    """Estima filas (de la tabla ancha) por batch a partir del tamaño JSON de una muestra"""
+    pf = pq.ParquetFile(path)
+    sample = next(pf.iter_batches(batch_size=SAMPLE_ROWS), None)
+    if sample is None or sample.num_rows == 0:
+        return MIN_BATCH_SIZE
+
+    bytes_per_row = len(serialize(sample.to_pandas())) / sample.num_rows
+    size = int(TARGET_PAYLOAD_BYTES / max(bytes_per_row, 1))
+    return max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, size))
+
+
+# =========================
+# CHECKPOINT
+# =========================
+def _source_signature(path: str, table: str) -> Dict:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime, "table": table}
+
+
+def load_checkpoint(path: str, source: Dict) -> Optional[Dict]:
+    """Checkpoint previo si corresponde al mismo archivo y tabla; si no, None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != source:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+# =========================
+# UPLOAD
+# =========================
+def _with_retries(action: Callable[[], None], what: str):
+    """Ejecuta action con reintentos y backoff exponencial con jitter"""
+    for attempt in range(MAX_RETRIES):
+        try:
+            action()
+            return
+        except Exception as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            delay = BACKOFF_BASE * (2 ** attempt) * (1 + random.random())
+            print(f"⚠️  Error {what} ({e}); reintento en {delay:.1f}s")
+            time.sleep(delay)
 
-    rows = df.to_dict(orient="records")
 
-    total = len(rows)
-    total_batches = math.ceil(total / BATCH_SIZE)
+def upload_batch(supabase, payload: bytes, columns: List[str], table: str = TABLE_NAME,
+                 on_conflict: str = "geo,time"):
+    """
+    Upsert idempotente de un payload JSON ya serializado, con reintentos y backoff.
+
+    Se envía directo a PostgREST con ?columns=..., así las claves omitidas
+    (nulos) se guardan como NULL igual que antes.
+    """
+    def post():
+        response = supabase.postgrest.session.post(
+            f"/{table}",
+            params={"on_conflict": on_conflict, "columns": ",".join(columns)},
+            content=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Prefer": "resolution=merge-duplicates,return=minimal",
+            },
+        )
+        response.raise_for_status()
+
+    _with_retries(post, "subiendo batch")
+
+
+def apply_deletes(supabase, path: str = DELETES_PATH, upload_format: str = UPLOAD_FORMAT) -> int:
+    """
+    Borra en la base lo que el rebuild incremental eliminó (data/merge.py).
+
+    En formato ancho se borran las filas (geo, time) que desaparecieron; en
+    formato largo, las filas (geo, time, indicator) cuyo valor ya no existe
+    (valores que pasaron a nulo e indicadores borrados o renombrados). Una
+    consulta por país (e indicador); borrar dos veces es inocuo.
+
+    Returns:
+        número de consultas de borrado
+    """
+    if not os.path.exists(path):
+        return 0
+    deletes = pd.read_parquet(path)
+    table = UPLOAD_FORMATS[upload_format][0]
+    if upload_format == "wide":
+        deletes = deletes[deletes["row"]].drop_duplicates(["geo", "time"])
+        groups = deletes.groupby("geo")["time"]
+    else:
+        groups = deletes.groupby(["geo", "indicator"])["time"]
+
+    n = 0
+    for key, times in groups:
+        geo, indicator = key if isinstance(key, tuple) else (key, None)
+
+        def delete():
+            query = supabase.table(table).delete().eq("geo", str(geo).strip())
+            if indicator is not None:
+                query = query.eq("indicator", indicator)
+            query.in_("time", sorted(int(t) for t in times)).execute()
+
+        _with_retries(delete, "borrando filas")
+        n += 1
+    print(f"🗑️  {len(deletes)} borrados aplicados en {n} consultas")
+    return n
+
+
+def upload(path: str = MERGED_PATH, checkpoint_path: str = CHECKPOINT_PATH, upload_format: str = UPLOAD_FORMAT):
+    """
+    Sube la tabla en batches concurrentes leyendo el Parquet por chunks.
+
+    upload_format "wide" sube filas completas (geo, time, ~500 columnas);
+    "long" sube solo las celdas con dato como (geo, time, indicator, value).
+
+    Cada batch completado se registra en el checkpoint; si el proceso se corta,
+    la siguiente ejecución salta los batches ya subidos (el upsert por geo,time
+    hace que repetir un batch sea inocuo). Un archivo sin filas (p. ej. un
+    merged_changes.parquet sin cambios) no hace nada.
+    """
+    pf = pq.ParquetFile(path)
+    total = pf.metadata.num_rows
+    if total == 0:
+        print("Filas a subir: 0 (nada que subir)")
+        return
+
+    from supabase import create_client  # solo hace falta para subir (serializar no lo necesita)
+
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    table, on_conflict, serialize, columns_of = UPLOAD_FORMATS[upload_format]
+    columns = columns_of(path)
+
+    source = _source_signature(path, table)
+    checkpoint = load_checkpoint(checkpoint_path, source)
+    if checkpoint is None:
+        batch_size = BATCH_SIZE or auto_batch_size(path, serialize)
+        checkpoint = {"source": source, "batch_size": batch_size, "done": []}
+    else:
+        batch_size = checkpoint["batch_size"]
+        print(f"🔁 Reanudando: {len(checkpoint['done'])} batches ya subidos")
+
+    done = set(checkpoint["done"])
+    lock = threading.Lock()
+
+    total_batches = math.ceil(total / batch_size)
 
     print(f"Filas a subir: {total}")
-    print(f"Batches: {total_batches} (size={BATCH_SIZE})")
+    print(f"Batches: {total_batches} (size={batch_size}, workers={MAX_WORKERS})")
 
-    for i in range(START_BATCH-1, total_batches):
-        batch = rows[i * BATCH_SIZE : (i + 1) * BATCH_SIZE]
+    def mark_done(i: int, n_rows: int):
+        with lock:
+            done.add(i)
+            checkpoint["done"] = sorted(done)
+            save_checkpoint(checkpoint_path, checkpoint)
+        print(f"✅ Batch {i+1}/{total_batches} subido ({n_rows} filas)")
 
-        for r in batch:
-            for k, v in list(r.items()):
-                if isinstance(v, float) and (np.isnan(v) or np.isinf(v)):
-                    r[k] = None
+    def run(i: int, payload: bytes, n_rows: int):
+        upload_batch(supabase, payload, columns, table, on_conflict)
+        mark_done(i, n_rows)
 
-        supabase.table(TABLE_NAME).upsert(batch, on_conflict="geo,time").execute()
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        pending = set()
+        for i, record_batch in enumerate(pf.iter_batches(batch_size=batch_size)):
+            if i in done:
+                continue
 
-        print(f"✅ Batch {i+1}/{total_batches} subido ({len(batch)} filas)")
-        time.sleep(SLEEP_BETWEEN)
+            # Limitar batches en memoria: no leer más de 2x los workers por adelantado
+            while len(pending) >= 2 * MAX_WORKERS:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    fut.result()
 
+            payload = serialize(record_batch.to_pandas())
+            if payload != b"[]":
+                pending.add(pool.submit(run, i, payload, record_batch.num_rows))
+            else:
+                mark_done(i, 0)
+
+        for fut in pending:
+            fut.result()
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
     print("🚀 Carga completada")
 
 
+def upload_year_spans(supabase, path: str = FULL_MERGED_PATH):
+    """
+    Sube el primer y último año de cada país de la tabla ancha completa.
+
+    El formato largo no guarda los años sin dato; SupabaseLongDataSource usa
+    este tramo para reconstruir las mismas filas que la tabla ancha.
+    """
+    spans = year_spans(read_merged(path, columns=[]))
+    payload = json.dumps([
+        {"geo": geo.strip(), "first_year": first, "last_year": last} for geo, (first, last) in spans.items()
+    ]).encode("utf-8")
+    upload_batch(supabase, payload, ["geo", "first_year", "last_year"], SPANS_TABLE_NAME, "geo")
+    print(f"📅 Tramos de años subidos ({len(spans)} países)")
+
+
+def main():
+    # Primero los borrados: una columna renombrada se borra con el nombre viejo y se sube con el nuevo
+    if os.path.exists(DELETES_PATH):
+        from supabase import create_client
+
+        apply_deletes(create_client(SUPABASE_URL, SUPABASE_KEY), DELETES_PATH, UPLOAD_FORMAT)
+    upload(MERGED_PATH, CHECKPOINT_PATH, UPLOAD_FORMAT)
+
+    # Formato largo: tramos de años de la tabla completa (cambian con altas y borrados de filas)
+    if UPLOAD_FORMAT == "long":
+        from supabase import create_client
+
+        upload_year_spans(create_client(SUPABASE_URL, SUPABASE_KEY))
+
+
+# Ejecutar desde la raíz del repo: python -m data.df_db
 if __name__ == "__main__":
     main()
@@ -1,92 +1,148 @@
 import os
 import glob
+import json
+import hashlib
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from data.storage import MERGED_PATH, read_merged, write_merged
 
+MANIFEST_PATH = "merged_manifest.json"
+CHANGES_PATH = "merged_changes.parquet"  # filas cambiadas en la última corrida incremental
+DELETES_PATH = "merged_deletes.parquet"  # celdas/filas que dejaron de existir (data/df_db.py las borra)
+INCREMENTAL = True  # False -> rebuild completo sin usar el manifest
 
-def load_and_merge_folder(folder_path: str) -> pd.DataFrame:
-    files = sorted(glob.glob(os.path.join(folder_path, "*.csv")))
-    if not files:
-        raise FileNotFoundError(f"No se encontraron CSV en: {folder_path}")
+DELETE_COLUMNS = ["geo", "time", "indicator", "row"]
 
-    dfs = []
-    used_metric_names = set()
 
-    for fp in files:
-        df = pd.read_csv(fp)
+def read_indicator_file(fp: str) -> Optional[pd.DataFrame]:
+    """
+    Lee y limpia un CSV de indicador (geo, time, [gender], métrica).
 
-        # Validación mínima
-        if "geo" not in df.columns or "time" not in df.columns:
-            raise ValueError(f"El archivo {os.path.basename(fp)} no tiene columnas 'geo' y 'time'.")
+    Devuelve un DataFrame con 1 fila por geo+time y columnas geo/time/<métrica>,
+    o None si el archivo queda vacío después de limpiar.
+    """
+    df = pd.read_csv(fp)
 
-        # Quitar filas inválidas (geo o time vacíos) -> NO se agregan
-        df = df.dropna(subset=["geo", "time"])
-        if df.empty:
-            continue
+    # Validación mínima
+    if "geo" not in df.columns or "time" not in df.columns:
+        raise ValueError(f"El archivo {os.path.basename(fp)} no tiene columnas 'geo' y 'time'.")
+
+    # Quitar filas inválidas (geo o time vacíos) -> NO se agregan
+    df = df.dropna(subset=["geo", "time"])
+    if df.empty:
+        return None
+
+    # Tipos consistentes
+    df["geo"] = df["geo"].astype(str).str.strip()
+    df["time"] = pd.to_numeric(df["time"], errors="coerce")
+
+    # Si time no se pudo convertir, se elimina
+    df = df.dropna(subset=["time"])
+    if df.empty:
+        return None
+    df["time"] = df["time"].astype("Int64")
+
+    # Detectar columna de métrica (la 3ra columna, aparte de geo/time/gender si existe)
+    metric_cols = [c for c in df.columns if c not in ("geo", "time", "gender")]
+    if len(metric_cols) != 1:
+        raise ValueError(
+            f"Esperaba exactamente 1 columna de métrica además de geo/time/(gender), "
+            f"pero {os.path.basename(fp)} tiene: {metric_cols}"
+        )
+    value_col = metric_cols[0]
+
+    # (Opcional) si quieres ignorar filas donde el valor está vacío, descomenta:
+    # df = df.dropna(subset=[value_col])
+    # if df.empty:
+    #     return None
+
+    # Si existe gender (0/1), sumar hombres+mujeres por geo+time
+    if "gender" in df.columns:
+        df["gender"] = pd.to_numeric(df["gender"], errors="coerce")
+        df[value_col] = pd.to_numeric(df[value_col], errors="coerce")
+
+        df = (
+            df.groupby(["geo", "time"], as_index=False)[value_col]
+              .sum(min_count=1)
+        )
+    else:
+        # Asegura que el valor sea numérico si aplica (si no, queda como object)
+        df[value_col] = pd.to_numeric(df[value_col], errors="ignore")
+
+    # Si por cualquier razón quedan duplicados por geo+time, colapsarlos (último no-null)
+    if df.duplicated(subset=["geo", "time"]).any():
+        df = (
+            df.sort_values(["geo", "time"])
+              .groupby(["geo", "time"], as_index=False)[value_col]
+              .last()
+        )
+
+    return df[["geo", "time", value_col]]
+
+
+def _iter_indicator_files(files, workers: Optional[int]):
+    """Lee los archivos en orden, en un pool de procesos si workers != 1"""
+    if workers == 1:
+        for fp in files:
+            yield fp, read_indicator_file(fp)
+        return
 
-        # Tipos consistentes
-        df["geo"] = df["geo"].astype(str).str.strip()
-        df["time"] = pd.to_numeric(df["time"], errors="coerce")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(files) // (4 * (workers or os.cpu_count() or 1)))
+        yield from zip(files, pool.map(read_indicator_file, files, chunksize=chunksize))
 
-        # Si time no se pudo convertir, se elimina
-        df = df.dropna(subset=["time"])
-        if df.empty:
+
+def _combine_files(files, workers: Optional[int]) -> Tuple[pd.DataFrame, Dict[str, Optional[str]]]:
+    """Lee y combina los archivos; devuelve (tabla ancha indexada por geo+time, métrica por archivo)"""
+    series = []
+    metrics = {}
+    used_metric_names = set()
+
+    for fp, df in _iter_indicator_files(files, workers):
+        name = os.path.basename(fp)
+        if df is None:
+            metrics[name] = None
             continue
-        df["time"] = df["time"].astype("Int64")
-
-        # Detectar columna de métrica (la 3ra columna, aparte de geo/time/gender si existe)
-        metric_cols = [c for c in df.columns if c not in ("geo", "time", "gender")]
-        if len(metric_cols) != 1:
-            raise ValueError(
-                f"Esperaba exactamente 1 columna de métrica además de geo/time/(gender), "
-                f"pero {os.path.basename(fp)} tiene: {metric_cols}"
-            )
-        value_col = metric_cols[0]
-
-        # (Opcional) si quieres ignorar filas donde el valor está vacío, descomenta:
-        # df = df.dropna(subset=[value_col])
-        # if df.empty:
-        #     continue
-
-        # Si existe gender (0/1), sumar hombres+mujeres por geo+time
-        if "gender" in df.columns:
-            df["gender"] = pd.to_numeric(df["gender"], errors="coerce")
-            df[value_col] = pd.to_numeric(df[value_col], errors="coerce")
-
-            df = (
-                df.groupby(["geo", "time"], as_index=False)[value_col]
-                  .sum(min_count=1)
-            )
-        else:
-            # Asegura que el valor sea numérico si aplica (si no, queda como object)
-            df[value_col] = pd.to_numeric(df[value_col], errors="ignore")
-
-        # Si por cualquier razón quedan duplicados por geo+time, colapsarlos (último no-null)
-        if df.duplicated(subset=["geo", "time"]).any():
-            df = (
-                df.sort_values(["geo", "time"])
-                  .groupby(["geo", "time"], as_index=False)[value_col]
-                  .last()
-            )
+        value_col = df.columns[-1]
+        metrics[name] = value_col
 
         # Evitar colisiones de nombre de columna (si dos archivos traen mismo nombre)
-        base = os.path.splitext(os.path.basename(fp))[0]
+        base = os.path.splitext(name)[0]
         out_col = value_col
         if out_col in used_metric_names:
             out_col = f"{value_col}__{base}"
         used_metric_names.add(out_col)
 
-        df = df.rename(columns={value_col: out_col})
-        dfs.append(df)
+        # Solo se conserva la serie indexada; el DataFrame del archivo se libera
+        series.append(df.set_index(["geo", "time"])[value_col].rename(out_col))
 
-    if not dfs:
-        raise ValueError("Todos los CSV quedaron vacíos después de limpiar geo/time.")
+    if not series:
+        return pd.DataFrame(), metrics
+
+    # Combinación en una sola pasada por geo+time (unión de índices)
+    combined = pd.concat(series, axis=1, join="outer", copy=False)
+    combined.index.names = ["geo", "time"]
+    return combined, metrics
 
-    # Merge sucesivo por geo+time
-    merged = dfs[0]
-    for df in dfs[1:]:
-        merged = merged.merge(df, on=["geo", "time"], how="outer")
 
-    merged = merged.sort_values(["geo", "time"]).reset_index(drop=True)
+def load_and_merge_folder(folder_path: str, workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Une todos los CSV de indicadores de una carpeta en una tabla ancha geo+time.
+
+    Los archivos se parsean en paralelo (workers=None usa todos los CPUs,
+    workers=1 lee en serie) y se combinan en una sola pasada con un concat
+    alineado por el índice (geo, time), en lugar de un merge sucesivo por archivo.
+    """
+    files = sorted(glob.glob(os.path.join(folder_path, "*.csv")))
+    if not files:
+        raise FileNotFoundError(f"No se encontraron CSV en: {folder_path}")
+
+    merged, _ = _combine_files(files, workers)
+    if merged.empty:
+        raise ValueError("Todos los CSV quedaron vacíos después de limpiar geo/time.")
+
+    merged = merged.sort_index().reset_index()
 
     # Garantía: 1 fila por geo+time
     if merged.duplicated(subset=["geo", "time"]).any():
@@ -95,8 +151,199 @@ def load_and_merge_folder(folder_path: str) -> pd.DataFrame:
     return merged
 
 
+def file_fingerprint(fp: str) -> Dict:
+    """Hash sha256 y tamaño de un archivo fuente"""
+    h = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"sha256": h.hexdigest(), "size": os.path.getsize(fp)}
+
+
+def _load_manifest(manifest_path: str) -> Dict:
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest: Dict, manifest_path: str):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def _build_manifest(files, fingerprints: Dict, metrics: Dict) -> Dict:
+    """Manifest por archivo: hash, tamaño, métrica original y nombre de columna derivado"""
+    manifest = {}
+    used_metric_names = set()
+    for fp in files:
+        name = os.path.basename(fp)
+        metric = metrics.get(name)
+        out_col = None
+        if metric is not None:
+            # Misma regla de colisiones que load_and_merge_folder
+            base = os.path.splitext(name)[0]
+            out_col = metric
+            if out_col in used_metric_names:
+                out_col = f"{metric}__{base}"
+            used_metric_names.add(out_col)
+        manifest[name] = {**fingerprints[name], "metric": metric, "column": out_col}
+    return manifest
+
+
+def _read_merged(merged_path: str) -> pd.DataFrame:
+    if merged_path.endswith(".parquet"):
+        merged = read_merged(merged_path)
+    else:
+        merged = pd.read_csv(merged_path, low_memory=False)
+    merged["time"] = merged["time"].astype("Int64")
+    return merged
+
+
+def _empty_deletes() -> pd.DataFrame:
+    return pd.DataFrame({"geo": pd.Series(dtype=object), "time": pd.Series(dtype="Int64"),
+                         "indicator": pd.Series(dtype=object), "row": pd.Series(dtype=bool)})
+
+
+def update_merged_incremental(
+    folder_path: str,
+    merged_path: str = MERGED_PATH,
+    manifest_path: str = MANIFEST_PATH,
+    workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, pd.MultiIndex, pd.DataFrame]:
+    """
+    Actualiza la tabla merged procesando solo los CSV que cambiaron.
+
+    Compara el hash de cada archivo con el manifest, re-lee solo los archivos
+    nuevos o modificados, parchea sus columnas en la tabla existente y elimina
+    las de archivos borrados. Sin manifest o tabla previa hace un rebuild completo.
+
+    Un upsert de las filas cambiadas no borra nada en la base: las celdas que
+    tenían dato y ya no lo tienen (valores que pasaron a nulo, columnas de
+    archivos borrados o renombradas) se devuelven aparte, con row=True si la
+    fila (geo, time) entera desapareció de la tabla.
+
+    Returns:
+        (tabla merged actualizada, índice (geo, time) de filas cuyos valores cambiaron,
+         DataFrame de borrados con columnas geo, time, indicator, row)
+    """
+    files = sorted(glob.glob(os.path.join(folder_path, "*.csv")))
+    if not files:
+        raise FileNotFoundError(f"No se encontraron CSV en: {folder_path}")
+
+    old_manifest = _load_manifest(manifest_path)
+    fingerprints = {os.path.basename(fp): file_fingerprint(fp) for fp in files}
+
+    # Sin estado previo -> rebuild completo, todas las filas cuentan como cambiadas
+    if not old_manifest or not os.path.exists(merged_path):
+        merged, metrics = _combine_files(files, workers)
+        if merged.empty:
+            raise ValueError("Todos los CSV quedaron vacíos después de limpiar geo/time.")
+        merged = merged.sort_index()
+        _save_manifest(_build_manifest(files, fingerprints, metrics), manifest_path)
+        return merged.reset_index(), merged.index, _empty_deletes()
+
+    changed_files = [
+        fp for fp in files
+        if old_manifest.get(os.path.basename(fp), {}).get("sha256")
+        != fingerprints[os.path.basename(fp)]["sha256"]
+    ]
+    removed = [name for name in old_manifest if name not in fingerprints]
+
+    merged = _read_merged(merged_path).set_index(["geo", "time"])
+    if not changed_files and not removed:
+        return merged.reset_index(), merged.index[:0], _empty_deletes()
+
+    # Re-leer solo los archivos modificados
+    patch, new_metrics = _combine_files(changed_files, workers)
+    metrics = {name: entry.get("metric") for name, entry in old_manifest.items()}
+    metrics.update(new_metrics)
+    manifest = _build_manifest(files, fingerprints, metrics)
+
+    # Quitar las columnas de archivos borrados o modificados (se guardan para comparar)
+    dropped_cols = [
+        old_manifest[name]["column"]
+        for name in removed + list(new_metrics)
+        if old_manifest.get(name, {}).get("column") in merged.columns
+    ]
+    before = merged[dropped_cols]
+    merged = merged.drop(columns=dropped_cols)
+
+    # Renombrar columnas de archivos sin cambios si la regla de colisiones cambió
+    renamed = {
+        old_manifest[name]["column"]: entry["column"]
+        for name, entry in manifest.items()
+        if name in old_manifest and name not in new_metrics
+        and old_manifest[name].get("column") not in (None, entry["column"])
+        and old_manifest[name]["column"] in merged.columns
+    }
+    renamed_before = merged[list(renamed)]
+    merged = merged.rename(columns=renamed)
+
+    # Parchear las columnas nuevas alineadas por (geo, time)
+    patch_cols = []
+    if not patch.empty:
+        patch.columns = [manifest[name]["column"] for name, m in new_metrics.items() if m is not None]
+        patch_cols = list(patch.columns)
+        merged = merged.join(patch, how="outer")
+
+    # Filas que solo existían por columnas eliminadas quedan vacías -> se quitan
+    orphan = merged.isna().all(axis=1) & merged.index.isin(before.dropna(how="all").index)
+    merged = merged[~orphan]
+
+    # Orden de columnas igual al de un rebuild completo
+    ordered = [manifest[os.path.basename(fp)]["column"] for fp in files]
+    merged = merged[[c for c in ordered if c is not None]].sort_index()
+
+    # Filas cuyos valores cambiaron en alguna columna tocada, y celdas que perdieron el dato
+    keys = merged.index.union(before.index)
+    before = before.reindex(keys)
+    after = merged[patch_cols].reindex(keys)
+    changed = pd.Series(False, index=keys)
+    deleted = []
+    for col in set(before.columns) | set(patch_cols):
+        b = before[col] if col in before.columns else pd.Series(None, index=keys, dtype=object)
+        a = after[col] if col in after.columns else pd.Series(None, index=keys, dtype=object)
+        same = (a.isna() & b.isna()) | (a == b).fillna(False).astype(bool)
+        changed |= ~same
+        deleted.append((col, keys[(b.notna() & a.isna()).to_numpy()]))
+
+    # Columnas renombradas: el nombre viejo se borra y las filas se suben con el nuevo
+    for old_col in renamed_before.columns:
+        had_value = renamed_before.index[renamed_before[old_col].notna().to_numpy()]
+        deleted.append((old_col, had_value))
+        changed |= pd.Series(keys.isin(had_value), index=keys)
+
+    gone = keys[~keys.isin(merged.index)]
+    frames = [
+        pd.DataFrame({"geo": idx.get_level_values("geo"), "time": idx.get_level_values("time"),
+                      "indicator": col, "row": idx.isin(gone)})
+        for col, idx in deleted if len(idx)
+    ]
+    deletes = pd.concat(frames, ignore_index=True) if frames else _empty_deletes()
+
+    _save_manifest(manifest, manifest_path)
+    return merged.reset_index(), keys[changed.to_numpy()], deletes[DELETE_COLUMNS]
+
+
+# Ejecutar desde la raíz del repo: python -m data.merge
 if __name__ == "__main__":
     folder = "/Users/josemiguelreyesalegria/Desktop/ddf--gapminder--systema_globalis-master/countries-etc-datapoints"
-    result = load_and_merge_folder(folder)
+    if INCREMENTAL:
+        result, changed_keys, deletes = update_merged_incremental(folder, MERGED_PATH)
+        print(f"Filas con cambios: {len(changed_keys)}, celdas borradas: {len(deletes)}")
+
+        # Solo las filas cambiadas y los borrados, para aplicarlos con data/df_db.py
+        indexed = result.set_index(["geo", "time"])
+        write_merged(indexed[indexed.index.isin(changed_keys)].reset_index(), CHANGES_PATH)
+        deletes.to_parquet(DELETES_PATH, index=False)
+    else:
+        result = load_and_merge_folder(folder)
+        # Un rebuild completo invalida el delta anterior: sin CHANGES_PATH, country_facts recalcula todo
+        if os.path.exists(CHANGES_PATH):
+            os.remove(CHANGES_PATH)
+        _empty_deletes().to_parquet(DELETES_PATH, index=False)  # no quedan borrados pendientes
     print(result.head())
-    result.to_csv("merged_output.csv", index=False)
+    write_merged(result, MERGED_PATH)
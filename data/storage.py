@@ -0,0 +1,251 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# =========================
+# CONFIG
+# =========================
+MERGED_PATH = "merged_output.parquet"
+LONG_PATH = "merged_long.parquet"
+GEOS_PER_ROW_GROUP = 1  # 1 row group por país -> leer un país solo toca su row group
+
+
+def write_merged(df: pd.DataFrame, path: str = MERGED_PATH, geos_per_row_group: int = GEOS_PER_ROW_GROUP):
+    """
+    Escribe la tabla merged en Parquet, ordenada por geo+time y con row groups por país.
+
+    Las estadísticas min/max de 'geo' por row group permiten que los lectores
+    filtren países sin descomprimir el resto del archivo.
+    """
+    df = df.sort_values(["geo", "time"]).reset_index(drop=True)
+    df["geo"] = df["geo"].astype(str)
+    df["time"] = df["time"].astype("int32")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Límites de row group en cada cambio de país
+    geo = df["geo"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, geo[1:] != geo[:-1]])
+    starts = np.r_[starts[::geos_per_row_group], len(df)]
+
+    tmp_path = path + ".tmp"
+    with pq.ParquetWriter(tmp_path, table.schema, compression="zstd") as writer:
+        for start, end in zip(starts[:-1], starts[1:]):
+            writer.write_table(table.slice(start, end - start))
+    os.replace(tmp_path, path)
+
+
+def merged_columns(path: str = MERGED_PATH) -> List[str]:
+    """Nombres de columnas de la tabla merged (solo lee el schema)"""
+    return pq.read_schema(path).names
+
+
+def read_merged(
+    path: str = MERGED_PATH,
+    columns: Optional[Sequence[str]] = None,
+    geos: Optional[Sequence[str]] = None,
+    time_range: Optional[Tuple[int, int]] = None,
+) -> pd.DataFrame:
+    """
+    Lee la tabla merged cargando solo las columnas y países pedidos.
+
+    Args:
+        columns: columnas de métricas (geo y time siempre se incluyen); None = todas
+        geos: códigos de país a cargar; None = todos
+        time_range: (año_inicio, año_fin) inclusivo; None = todos los años
+    """
+    if columns is not None:
+        columns = ["geo", "time"] + [c for c in columns if c not in ("geo", "time")]
+
+    filters = []
+    if geos is not None:
+        filters.append(("geo", "in", [str(g).lower() for g in geos]))
+    if time_range is not None:
+        filters.append(("time", ">=", int(time_range[0])))
+        filters.append(("time", "<=", int(time_range[1])))
+
+    table = pq.read_table(
+        path,
+        columns=columns,
+        filters=filters or None,
+        memory_map=True,
+    )
+    return table.to_pandas()
+
+
+# =========================
+# FORMATO LARGO (geo, time, indicator, value)
+# =========================
+def to_long(df: pd.DataFrame, columns: Optional[Sequence[str]] = None,
+            value_dtype=np.float32) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Convierte la tabla ancha a formato largo descartando las celdas vacías.
+
+    Tipos compactos: geo categórico, time int16, indicator int16 (código en la
+    lista de indicadores devuelta) y value float32 (~7 dígitos significativos;
+    usar value_dtype=np.float64 si se necesita precisión exacta, p. ej. al subir).
+    Las columnas no numéricas se convierten con to_numeric (los valores no
+    numéricos se descartan).
+
+    Returns:
+        (tabla larga, nombres de indicadores indexados por código)
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c not in ("geo", "time")]
+    columns = list(columns)
+
+    values = np.column_stack([
+        pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=value_dtype, na_value=np.nan) for c in columns
+    ]) if columns else np.empty((len(df), 0), dtype=value_dtype)
+    values[~np.isfinite(values)] = np.nan
+
+    rows, codes = np.nonzero(~np.isnan(values))
+    geo = df["geo"].astype(str).to_numpy()
+
+    long_df = pd.DataFrame({
+        "geo": pd.Categorical(geo[rows]),
+        "time": df["time"].to_numpy(dtype=np.int64)[rows].astype(np.int16),
+        "indicator": codes.astype(np.int16),
+        "value": values[rows, codes],
+    })
+    return long_df, columns
+
+
+def year_spans(df: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """Primer y último año de cada país en la tabla ancha (incluye filas sin ningún dato)"""
+    spans = df.groupby(df["geo"].astype(str).str.lower())["time"].agg(["min", "max"])
+    return {geo: (int(lo), int(hi)) for geo, lo, hi in zip(spans.index, spans["min"], spans["max"])}
+
+
+def write_long(df: pd.DataFrame, path: str = LONG_PATH):
+    """Escribe la tabla merged en formato largo, con row groups por país"""
+    long_df, indicators = to_long(df)
+    long_df = long_df.sort_values(["geo", "indicator", "time"]).reset_index(drop=True)
+
+    table = pa.Table.from_pandas(long_df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"indicators"] = json.dumps(indicators).encode("utf-8")
+    metadata[b"year_spans"] = json.dumps(year_spans(df)).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    geo_codes = long_df["geo"].cat.codes.to_numpy()
+    starts = np.flatnonzero(np.r_[True, geo_codes[1:] != geo_codes[:-1]]) if len(long_df) else np.array([0])
+    bounds = list(starts) + [len(long_df)]
+
+    tmp_path = path + ".tmp"
+    with pq.ParquetWriter(tmp_path, table.schema, compression="zstd") as writer:
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            writer.write_table(table.slice(start, end - start))
+    os.replace(tmp_path, path)
+
+
+def long_indicators(path: str = LONG_PATH) -> List[str]:
+    """Nombres de indicadores (por código) guardados en la metadata del Parquet largo"""
+    return json.loads(pq.read_schema(path).metadata[b"indicators"])
+
+
+def long_year_spans(path: str = LONG_PATH) -> Optional[Dict[str, Tuple[int, int]]]:
+    """Años de cada país en la tabla ancha original (None si el archivo es anterior a este dato)"""
+    raw = pq.read_schema(path).metadata.get(b"year_spans")
+    return {geo: tuple(span) for geo, span in json.loads(raw).items()} if raw else None
+
+
+def read_long(
+    path: str = LONG_PATH,
+    geos: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+    time_range: Optional[Tuple[int, int]] = None,
+) -> pd.DataFrame:
+    """Lee la tabla larga filtrando por países, indicadores (por nombre) y años"""
+    filters = []
+    if geos is not None:
+        filters.append(("geo", "in", [str(g).lower() for g in geos]))
+    if columns is not None:
+        index = {name: i for i, name in enumerate(long_indicators(path))}
+        filters.append(("indicator", "in", [index[c] for c in columns if c in index]))
+    if time_range is not None:
+        filters.append(("time", ">=", int(time_range[0])))
+        filters.append(("time", "<=", int(time_range[1])))
+
+    return pq.read_table(path, filters=filters or None, memory_map=True).to_pandas()
+
+
+def clip_years(span: Tuple[int, int], start_year: Optional[int], end_year: Optional[int]) -> Tuple[int, int]:
+    """Ventana pedida recortada al tramo de años del país (un límite None usa el del tramo)"""
+    first, last = int(span[0]), int(span[1])
+    return (first if start_year is None else max(int(start_year), first),
+            last if end_year is None else min(int(end_year), last))
+
+
+def pivot_long(
+    long_df: pd.DataFrame,
+    indicators: Sequence[str],
+    columns: Optional[Sequence[str]] = None,
+    year_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+    year_spans: Optional[Dict[str, Tuple[int, int]]] = None,
+    geos: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Reconstruye un slice ancho (geo, time, columnas) desde filas largas.
+
+    El formato largo no guarda los años sin dato, así que cada país se
+    reindexa sobre todos sus años de la ventana (con NaN en los huecos) para
+    que la completitud se mida como en la tabla ancha: year_range recortado
+    al tramo de años del país en la tabla ancha (year_spans, ver
+    long_year_spans) o, si no se conoce, a sus años con dato en long_df.
+
+    Args:
+        geos: países pedidos; los que tienen tramo en year_spans aparecen
+            (con NaN) aunque no tengan ningún dato en estas columnas
+    """
+    if columns is None:
+        columns = list(indicators)
+    columns = list(columns)
+    year_spans = year_spans or {}
+
+    if len(long_df):
+        wide = long_df.pivot_table(index=["geo", "time"], columns="indicator", values="value",
+                                   aggfunc="first", observed=True)
+        wide.columns = [indicators[int(c)] for c in wide.columns]
+        wide = wide.reindex(columns=columns).reset_index()
+        wide["geo"] = wide["geo"].astype(str)
+        wide["time"] = wide["time"].astype(np.int64)
+    else:
+        wide = pd.DataFrame({"geo": pd.Series(dtype=str), "time": pd.Series(dtype=np.int64)}).reindex(
+            columns=["geo", "time"] + columns)
+
+    # Tramo de años de cada país: el de la tabla ancha si se conoce, si no sus años con dato
+    observed = wide.groupby("geo")["time"].agg(["min", "max"])
+    spans = {geo: year_spans.get(geo, (first, last))
+             for geo, first, last in zip(observed.index, observed["min"], observed["max"])}
+    for geo in geos or ():
+        if geo in year_spans:
+            spans.setdefault(geo, year_spans[geo])
+
+    # Todos los años de la ventana de cada país (los huecos quedan en NaN)
+    start_year, end_year = year_range if year_range is not None else (None, None)
+    keys = []
+    for geo, span in spans.items():
+        lo, hi = clip_years(span, start_year, end_year)
+        keys.extend((geo, year) for year in range(lo, hi + 1))
+    if not keys:
+        return pd.DataFrame(columns=["geo", "time"] + columns)
+    full = pd.MultiIndex.from_tuples(keys, names=["geo", "time"])
+    wide = wide.set_index(["geo", "time"]).reindex(full).reset_index()
+    wide["time"] = wide["time"].astype(np.int64)
+    return wide.sort_values(["geo", "time"]).reset_index(drop=True)
+
+
+def read_long_wide(
+    path: str = LONG_PATH,
+    geos: Optional[Sequence[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+    time_range: Optional[Tuple[int, int]] = None,
+) -> pd.DataFrame:
+    """Lee del formato largo y pivota a ancho solo el país/columnas pedidos"""
+    return pivot_long(read_long(path, geos, columns, time_range), long_indicators(path), columns, time_range,
+                      long_year_spans(path), geos=[str(g).lower() for g in geos] if geos is not None else None)
@@ -0,0 +1,347 @@
+import asyncio
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from supabase import acreate_client, create_client
+except ImportError:  # Supabase es opcional si se usa una fuente local
+    acreate_client = create_client = None
+
+# =========================
+# CONFIG
+# =========================
+PAGE_SIZE = 1000  # filas por página en consultas de varios países (límite por defecto de PostgREST)
+SPANS_TABLE = "country_year_spans"  # geo, first_year, last_year de la tabla ancha (data/df_db.py)
+
+
+class DataSource(ABC):
+    """
+    Interfaz de acceso a datos por país para SupabaseRecommender.
+
+    fetch() (y su versión async afetch()) devuelve un DataFrame con 'geo',
+    'time' y las columnas pedidas (ordenado por 'time'), o None si no hay filas.
+    fetch_many() hace lo mismo para varios países (ordenado por 'geo' y 'time').
+    Las fuentes con supports_sync = False solo sirven para afetch().
+    local_source() indica si detrás hay una tabla en memoria (las que envuelven
+    otra fuente delegan en ella).
+    """
+
+    supports_sync = True
+
+    def local_source(self) -> Optional["LocalDataSource"]:
+        """Fuente local que responde las consultas (None si salen a la red)"""
+        return None
+
+    @abstractmethod
+    def fetch(
+        self,
+        country_code: str,
+        columns: List[str],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        ...
+
+    async def afetch(
+        self,
+        country_code: str,
+        columns: List[str],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Versión async de fetch (las fuentes en memoria responden directamente)"""
+        return self.fetch(country_code, columns, start_year, end_year)
+
+    def fetch_many(
+        self,
+        country_codes: List[str],
+        columns: List[str],
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+    ) -> Optional[pd.DataFrame]:
+        """Datos de varios países; por defecto, una consulta por país"""
+        frames = [self.fetch(code, columns, start_year, end_year) for code in country_codes]
+        frames = [f for f in frames if f is not None and len(f) > 0]
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+
+def _apply_filters(query, country_code: str, start_year: Optional[int], end_year: Optional[int]):
+    query = query.eq('geo', country_code.lower())
+    if start_year is not None:
+        query = query.gte('time', start_year)
+    if end_year is not None:
+        query = query.lte('time', end_year)
+    return query.order('time', desc=False)
+
+
+def _apply_batch_filters(query, country_codes: List[str], start_year: Optional[int], end_year: Optional[int]):
+    query = query.in_('geo', sorted({c.lower() for c in country_codes}))
+    if start_year is not None:
+        query = query.gte('time', start_year)
+    if end_year is not None:
+        query = query.lte('time', end_year)
+    return query.order('geo', desc=False).order('time', desc=False)
+
+
+def _fetch_pages(build_query) -> List[Dict]:
+    """Recorre una consulta por páginas de PAGE_SIZE filas (build_query crea la consulta base)"""
+    rows, offset = [], 0
+    while True:
+        response = build_query().range(offset, offset + PAGE_SIZE - 1).execute()
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+class SupabaseDataSource(DataSource):
+    """Fuente remota: tabla 'country_data' en Supabase"""
+
+    def __init__(self, url: str, key: str, table: str = "country_data"):
+        if create_client is None:
+            raise ImportError("El paquete 'supabase' no está instalado; usa LocalDataSource")
+        self.client = create_client(url, key)
+        self.table = table
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        select_str = ','.join(['geo', 'time'] + list(columns))
+
+        query = self.client.table(self.table).select(select_str)
+        response = _apply_filters(query, country_code, start_year, end_year).execute()
+        if not response.data:
+            return None
+        return pd.DataFrame(response.data)
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        """Una sola consulta geo IN (...) paginada"""
+        select_str = ','.join(['geo', 'time'] + list(columns))
+        rows = _fetch_pages(lambda: _apply_batch_filters(
+            self.client.table(self.table).select(select_str), country_codes, start_year, end_year
+        ))
+        if not rows:
+            return None
+        return pd.DataFrame(rows)
+
+
+class SupabaseLongDataSource(SupabaseDataSource):
+    """
+    Fuente remota sobre la tabla en formato largo (geo, time, indicator, value).
+
+    Solo viajan los puntos con dato; el slice ancho se reconstruye localmente
+    con la misma regla que LongDataSource: la ventana pedida recortada al
+    tramo de años de cada país en la tabla ancha, leído una vez de SPANS_TABLE
+    (o pasado como year_spans). Países sin tramo conocido usan sus años con dato.
+    """
+
+    def __init__(self, url: str, key: str, table: str = "country_datapoints_long",
+                 spans_table: str = SPANS_TABLE, year_spans: Optional[Dict[str, Tuple[int, int]]] = None):
+        super().__init__(url, key, table)
+        self.spans_table = spans_table
+        self.year_spans = year_spans
+
+    def _year_spans(self) -> Dict[str, Tuple[int, int]]:
+        if self.year_spans is None:
+            rows = _fetch_pages(lambda: self.client.table(self.spans_table)
+                                .select('geo,first_year,last_year').order('geo', desc=False))
+            self.year_spans = {str(r['geo']).lower(): (int(r['first_year']), int(r['last_year'])) for r in rows}
+        return self.year_spans
+
+    def _pivot(self, rows: List[Dict], country_codes: List[str], columns: List[str],
+               start_year, end_year) -> Optional[pd.DataFrame]:
+        """Slice ancho; None si ningún país tiene años en la ventana (como la tabla ancha)"""
+        from data.storage import pivot_long
+
+        long_df = pd.DataFrame(rows, columns=['geo', 'time', 'indicator', 'value'])
+        codes = {name: i for i, name in enumerate(columns)}
+        long_df["indicator"] = long_df["indicator"].map(codes)
+        long_df["geo"] = long_df["geo"].astype(str).str.lower()
+        wide = pivot_long(long_df, columns, columns, (start_year, end_year), self._year_spans(),
+                          geos=[c.lower() for c in country_codes])
+        return wide if len(wide) else None
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        """Paginada: un país con muchos indicadores supera fácilmente PAGE_SIZE puntos"""
+        rows = _fetch_pages(lambda: _apply_filters(
+            self.client.table(self.table).select('geo,time,indicator,value').in_('indicator', list(columns)),
+            country_code, start_year, end_year
+        ).order('indicator', desc=False))
+        return self._pivot(rows, [country_code], list(columns), start_year, end_year)
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        rows = _fetch_pages(lambda: _apply_batch_filters(
+            self.client.table(self.table).select('geo,time,indicator,value').in_('indicator', list(columns)),
+            country_codes, start_year, end_year
+        ).order('indicator', desc=False))
+        return self._pivot(rows, list(country_codes), list(columns), start_year, end_year)
+
+
+class AsyncSupabaseDataSource(DataSource):
+    """
+    Fuente remota async: un único AsyncClient compartido (reutiliza el pool
+    de conexiones HTTP) y un semáforo que acota las consultas simultáneas.
+    """
+
+    def __init__(self, client, table: str = "country_data", max_concurrency: int = 16):
+        self.client = client
+        self.table = table
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    async def create(cls, url: str, key: str, table: str = "country_data",
+                     max_concurrency: int = 16) -> "AsyncSupabaseDataSource":
+        if acreate_client is None:
+            raise ImportError("El paquete 'supabase' no está instalado; usa LocalDataSource")
+        return cls(await acreate_client(url, key), table, max_concurrency)
+
+    supports_sync = False
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        raise TypeError("AsyncSupabaseDataSource solo soporta afetch(); usa AsyncSupabaseRecommender")
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        raise TypeError("AsyncSupabaseDataSource solo soporta afetch(); usa AsyncSupabaseRecommender")
+
+    async def afetch(self, country_code, columns, start_year=None, end_year=None):
+        select_str = ','.join(['geo', 'time'] + list(columns))
+
+        async with self.semaphore:
+            query = self.client.table(self.table).select(select_str)
+            response = await _apply_filters(query, country_code, start_year, end_year).execute()
+        if not response.data:
+            return None
+        return pd.DataFrame(response.data)
+
+
+class LocalDataSource(DataSource):
+    """
+    Fuente local en memoria construida a partir de la tabla merged.
+
+    Las filas se ordenan por geo+time y se guarda el rango de filas de cada
+    país, así una consulta es un slice + búsqueda binaria de años, sin red.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.sort_values(["geo", "time"], kind="stable").reset_index(drop=True)
+        df["geo"] = df["geo"].astype(str).str.lower()
+        self.df = df
+        self.times = df["time"].to_numpy(dtype=np.int64)
+
+        geo = df["geo"].to_numpy()
+        boundaries = np.flatnonzero(geo[1:] != geo[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(df)]))
+        self.geo_slices: Dict[str, Tuple[int, int]] = {
+            geo[s]: (int(s), int(e)) for s, e in zip(starts, ends) if e > s
+        }
+
+    @classmethod
+    def from_parquet(cls, path: Optional[str] = None, columns: Optional[List[str]] = None) -> "LocalDataSource":
+        """Carga la tabla merged desde Parquet (opcionalmente solo algunas columnas)"""
+        from data.storage import MERGED_PATH, read_merged
+        return cls(read_merged(path or MERGED_PATH, columns=columns))
+
+    def local_source(self) -> "LocalDataSource":
+        return self
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        bounds = self.geo_slices.get(country_code.lower())
+        if bounds is None:
+            return None
+
+        start, end = bounds
+        times = self.times[start:end]
+        if start_year is not None:
+            start += int(np.searchsorted(times, start_year, side="left"))
+        if end_year is not None:
+            end = bounds[0] + int(np.searchsorted(times, end_year, side="right"))
+        if end <= start:
+            return None
+
+        cols = ['geo', 'time'] + [c for c in columns if c in self.df.columns]
+        return self.df.iloc[start:end][cols].reset_index(drop=True)
+
+    def fetch_many(self, country_codes, columns, start_year=None, end_year=None):
+        """Un único take sobre los rangos de filas de todos los países"""
+        ranges = []
+        for code in sorted({c.lower() for c in country_codes}):
+            bounds = self.geo_slices.get(code)
+            if bounds is None:
+                continue
+            start, end = bounds
+            times = self.times[start:end]
+            if start_year is not None:
+                start = bounds[0] + int(np.searchsorted(times, start_year, side="left"))
+            if end_year is not None:
+                end = bounds[0] + int(np.searchsorted(times, end_year, side="right"))
+            if end > start:
+                ranges.append(np.arange(start, end))
+        if not ranges:
+            return None
+
+        cols = ['geo', 'time'] + [c for c in columns if c in self.df.columns]
+        positions = [self.df.columns.get_loc(c) for c in cols]
+        return self.df.iloc[np.concatenate(ranges), positions].reset_index(drop=True)
+
+
+class LongDataSource(DataSource):
+    """
+    Fuente local sobre la tabla en formato largo (data/storage.py).
+
+    Guarda solo los puntos con dato (float32, códigos int16) y pivota a ancho
+    en cada consulta el país y las columnas pedidas. year_spans (primer y
+    último año de cada país en la tabla ancha) permite reconstruir también
+    los años sin ningún dato; sin él se usan los años con algún dato.
+    """
+
+    def __init__(self, long_df: pd.DataFrame, indicators: List[str],
+                 year_spans: Optional[Dict[str, Tuple[int, int]]] = None):
+        long_df = long_df.sort_values(["geo", "time"], kind="stable").reset_index(drop=True)
+        self.long_df = long_df
+        self.indicators = indicators
+        self.indicator_index = {name: i for i, name in enumerate(indicators)}
+        self.times = long_df["time"].to_numpy(dtype=np.int64)
+        self.year_spans = year_spans or {}
+
+        geo = long_df["geo"].astype(str).to_numpy()
+        boundaries = np.flatnonzero(geo[1:] != geo[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(long_df)]))
+        self.geo_slices: Dict[str, Tuple[int, int]] = {
+            geo[s]: (int(s), int(e)) for s, e in zip(starts, ends) if e > s
+        }
+
+    @classmethod
+    def from_parquet(cls, path: Optional[str] = None) -> "LongDataSource":
+        from data.storage import LONG_PATH, long_indicators, long_year_spans, read_long
+        path = path or LONG_PATH
+        return cls(read_long(path), long_indicators(path), long_year_spans(path))
+
+    def fetch(self, country_code, columns, start_year=None, end_year=None):
+        from data.storage import pivot_long
+
+        bounds = self.geo_slices.get(country_code.lower())
+        if bounds is None:
+            return None
+
+        start, end = bounds
+        times = self.times[start:end]
+        if start_year is not None:
+            start = bounds[0] + int(np.searchsorted(times, start_year, side="left"))
+        if end_year is not None:
+            end = bounds[0] + int(np.searchsorted(times, end_year, side="right"))
+
+        # Misma regla que SupabaseLongDataSource (ver pivot_long): la ventana pedida
+        # recortada al tramo del país en la tabla ancha (o a sus años con algún dato)
+        geo = country_code.lower()
+        spans = {geo: self.year_spans.get(geo, (int(times[0]), int(times[-1])))}
+        columns = [c for c in columns if c in self.indicator_index]
+        rows = self.long_df.iloc[start:end]
+        rows = rows[rows["indicator"].isin([self.indicator_index[c] for c in columns])]
+
+        wide = pivot_long(rows, self.indicators, columns, (start_year, end_year), spans, geos=[geo])
+        return wide if len(wide) else None
@@ -0,0 +1,128 @@
+import re
+import numpy as np
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+# =========================
+# CONFIG
+# =========================
+DIMENSIONS = [
+    "mental health",
+    "physical health",
+    "economy",
+    "education",
+    "environment",
+    "social wellbeing",
+    "safety",
+    "demographics"
+]
+
+# Vocabulario del frontend -> etiqueta del clasificador, o reparto ponderado
+# entre varias etiquetas cuando no hay una equivalente directa
+ALIASES: Dict[str, Union[str, Dict[str, float]]] = {
+    "mental": "mental health",
+    "mental wellbeing": "mental health",
+    "happiness": "mental health",
+    "physical": "physical health",
+    "health": {"physical health": 1.0, "mental health": 0.5},
+    "healthcare": "physical health",
+    "economic": "economy",
+    "economics": "economy",
+    "wealth": "economy",
+    "income": "economy",
+    "jobs": "economy",
+    "work": "economy",
+    "educational": "education",
+    "schools": "education",
+    "learning": "education",
+    "environmental": "environment",
+    "climate": "environment",
+    "nature": "environment",
+    "social": "social wellbeing",
+    "wellbeing": "social wellbeing",
+    "community": "social wellbeing",
+    "cultural": {"social wellbeing": 1.0, "education": 0.5, "demographics": 0.5},
+    "culture": {"social wellbeing": 1.0, "education": 0.5, "demographics": 0.5},
+    "security": "safety",
+    "crime": "safety",
+    "peace": "safety",
+    "demographic": "demographics",
+    "population": "demographics",
+}
+
+
+def normalize_key(key: str) -> str:
+    """'Mental_Health ' -> 'mental health'"""
+    return re.sub(r"[\s_\-]+", " ", str(key)).strip().lower()
+
+
+class DimensionMap:
+    """
+    Índice precalculado entre el vocabulario de prioridades y las etiquetas.
+
+    Cada clave conocida (etiqueta canónica o alias, ya normalizada) apunta a
+    una fila de `matrix` (n_claves × n_etiquetas) con su reparto sobre las
+    etiquetas, así convertir las prioridades de un usuario es un lookup por
+    clave más operaciones vectorizadas.
+    """
+
+    def __init__(self, labels: Sequence[str] = DIMENSIONS,
+                 aliases: Optional[Mapping[str, Union[str, Mapping[str, float]]]] = None):
+        """
+        Args:
+            labels: etiquetas destino (p. ej. las dimensiones del ScoringEngine)
+            aliases: alias -> etiqueta o {etiqueta: peso}; por defecto ALIASES.
+                Los pesos hacia etiquetas que no están en `labels` se ignoran.
+        """
+        if aliases is None:
+            aliases = ALIASES
+
+        self.labels: List[str] = [normalize_key(l) for l in labels]
+        self.label_index: Mapping[str, int] = MappingProxyType({l: i for i, l in enumerate(self.labels)})
+
+        rows = [np.eye(len(self.labels), dtype=np.float64)[i] for i in range(len(self.labels))]
+        key_ids = dict(self.label_index)
+
+        for alias, target in aliases.items():
+            key = normalize_key(alias)
+            if key in key_ids:
+                continue  # una etiqueta canónica nunca se redefine
+            spread = {target: 1.0} if isinstance(target, str) else target
+            row = np.zeros(len(self.labels), dtype=np.float64)
+            for label, weight in spread.items():
+                idx = self.label_index.get(normalize_key(label))
+                if idx is not None:
+                    row[idx] = weight
+            if row.any():
+                key_ids[key] = len(rows)
+                rows.append(row)
+
+        self.key_ids: Mapping[str, int] = MappingProxyType(key_ids)
+        self.matrix = np.vstack(rows) if rows else np.zeros((0, len(self.labels)), dtype=np.float64)
+        self.matrix.flags.writeable = False
+
+    def resolve(self, key: str) -> Optional[int]:
+        """Fila de `matrix` para una clave (None si no se reconoce)"""
+        return self.key_ids.get(normalize_key(key))
+
+    def unknown(self, user_scores: Mapping[str, float]) -> List[str]:
+        """Claves que no se pueden mapear a ninguna etiqueta"""
+        return [k for k in user_scores if self.resolve(k) is None]
+
+    def label_vector(self, user_scores: Mapping[str, float]) -> np.ndarray:
+        """
+        Prioridades del usuario proyectadas sobre las etiquetas.
+
+        Si varias claves caen en la misma etiqueta se toma el máximo, para que
+        'economy' y 'economic' juntos no cuenten doble.
+        """
+        vec = np.zeros(len(self.labels), dtype=np.float64)
+        ids, values = [], []
+        for k, v in user_scores.items():
+            idx = self.resolve(k)
+            if idx is not None:
+                ids.append(idx)
+                values.append(v)
+        if ids:
+            vec = np.maximum(vec, (np.asarray(values, dtype=np.float64)[:, None] * self.matrix[ids]).max(axis=0))
+        return vec
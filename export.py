@@ -0,0 +1,221 @@
+import gzip
+import json
+import numpy as np
+import pandas as pd
+from typing import BinaryIO, Dict, Iterable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # se usa json de la librería estándar
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# =========================
+# CONFIG
+# =========================
+EXPORT_FORMAT = "json"  # "json" (NDJSON al hacer streaming), "msgpack" o "arrow" (IPC stream)
+COMPRESSION = None  # None, "gzip" o "brotli"
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+PAYLOAD_FORMAT = 2  # 1 = 'records' por columna (layout antiguo), 2 = arrays paralelos 'time'/'values'
+
+FORMATS = ("json", "msgpack", "arrow")
+COMPRESSIONS = (None, "gzip", "brotli")
+
+
+def _float_list(values) -> list:
+    """Valores como floats de Python; NaN/inf -> None (JSON válido)"""
+    arr = pd.to_numeric(pd.Series(values, copy=False), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    if np.isfinite(arr).all():
+        return arr.tolist()
+    return [v if np.isfinite(v) else None for v in arr.tolist()]
+
+
+def result_payload(result: Dict, records: bool = False) -> Dict:
+    """
+    Resultado de get_recommendations listo para serializar.
+
+    Por defecto (format 2) cada columna lleva los años y los valores como
+    arrays paralelos ('time', 'values'). Con records=True se genera el
+    layout antiguo (format 1): una lista 'records' de {time, columna}.
+    """
+    data = []
+    for item in result['data']:
+        df = item['data']
+        column = item['column']
+        time = df['time'].to_numpy(dtype=np.int64).tolist()
+        values = _float_list(df[column].to_numpy())
+        entry = {
+            'column': column,
+            'start_year': int(item['start_year']),
+            'end_year': int(item['end_year']),
+            'completeness': float(item['completeness']),
+            'data_points': int(item['data_points']),
+        }
+        if records:
+            entry['records'] = [{'time': t, column: v} for t, v in zip(time, values)]
+        else:
+            entry['time'] = time
+            entry['values'] = values
+        data.append(entry)
+    return {
+        'format': 1 if records else PAYLOAD_FORMAT,
+        'country': result['country'],
+        'summary': result['summary'],
+        'columns': list(result['columns']),
+        'data': data,
+    }
+
+
+def dumps_json(obj) -> bytes:
+    """JSON compacto (orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _arrow_batch(payload: Dict):
+    """
+    Record batch con una fila por punto (country, column, time, value).
+
+    Returns:
+        (batch, metadata del batch con el resto del resultado en JSON bajo 'result')
+    """
+    import pyarrow as pa
+
+    data = payload['data']
+    sizes = [len(item['time']) for item in data]
+    batch = pa.record_batch({
+        'country': pa.array([payload['country']] * sum(sizes), pa.string()),
+        'column': pa.array(np.repeat([item['column'] for item in data], sizes).tolist(), pa.string()),
+        'time': pa.array([t for item in data for t in item['time']], pa.int32()),
+        'value': pa.array([v for item in data for v in item['values']], pa.float64()),
+    })
+    info = {k: v for k, v in payload.items() if k != 'data'}
+    info['data'] = [{k: v for k, v in item.items() if k not in ('time', 'values')} for item in data]
+    return batch, pa.KeyValueMetadata({b"result": dumps_json(info)})
+
+
+def encode(payload: Dict, fmt: str = EXPORT_FORMAT) -> bytes:
+    """Serializa un payload columnar completo (un país)"""
+    if fmt == "json":
+        return dumps_json(payload)
+    if fmt == "msgpack":
+        if msgpack is None:
+            raise ImportError("fmt='msgpack' requiere el paquete msgpack")
+        return msgpack.packb(payload, use_bin_type=True)
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        batch, metadata = _arrow_batch(payload)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch, custom_metadata=metadata)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Formato no soportado: {fmt} (usar {FORMATS})")
+
+
+class _BrotliWriter:
+    """Envuelve un archivo binario comprimiendo con brotli en streaming"""
+
+    def __init__(self, raw: BinaryIO, quality: int = BROTLI_QUALITY):
+        self.raw = raw
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def write(self, data: bytes) -> int:
+        self.raw.write(self._compressor.process(data))
+        return len(data)
+
+    def flush(self):
+        self.raw.write(self._compressor.flush())
+        self.raw.flush()
+
+    def close(self):
+        self.raw.write(self._compressor.finish())
+        self.raw.flush()
+
+
+def _open_compressed(raw: BinaryIO, compression: Optional[str]):
+    if compression is None:
+        return raw
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL)
+    if compression == "brotli":
+        if brotli is None:
+            raise ImportError("compression='brotli' requiere el paquete brotli")
+        return _BrotliWriter(raw)
+    raise ValueError(f"Compresión no soportada: {compression} (usar {COMPRESSIONS})")
+
+
+def write_export(
+    results: Iterable[Optional[Dict]],
+    target: Union[str, BinaryIO],
+    fmt: str = EXPORT_FORMAT,
+    compression: Optional[str] = COMPRESSION,
+) -> int:
+    """
+    Exporta resultados de varios países en streaming.
+
+    Cada resultado se convierte y se escribe apenas llega (los resultados
+    pueden venir de un generador), así la exportación no vive entera en
+    memoria. Formatos:
+
+        json     NDJSON: un objeto compacto por línea
+        msgpack  objetos MessagePack concatenados (msgpack.Unpacker los lee en streaming)
+        arrow    Arrow IPC stream, un record batch por país (custom metadata 'result' en cada batch)
+
+    Args:
+        target: ruta o archivo binario abierto (p. ej. socket.makefile('wb'));
+            un archivo abierto no se cierra
+        compression: None, "gzip" o "brotli"
+
+    Returns:
+        número de países exportados
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt} (usar {FORMATS})")
+    if fmt == "msgpack" and msgpack is None:
+        raise ImportError("fmt='msgpack' requiere el paquete msgpack")
+    if compression == "brotli" and brotli is None:
+        raise ImportError("compression='brotli' requiere el paquete brotli")
+
+    raw = open(target, "wb") if isinstance(target, str) else target
+    out = _open_compressed(raw, compression)
+    writer = None
+    n = 0
+    try:
+        for result in results:
+            if not result:
+                continue
+            payload = result_payload(result)
+            if fmt == "arrow":
+                import pyarrow as pa
+
+                batch, metadata = _arrow_batch(payload)
+                if writer is None:
+                    writer = pa.ipc.new_stream(out, batch.schema)
+                writer.write_batch(batch, custom_metadata=metadata)
+            elif fmt == "json":
+                out.write(dumps_json(payload) + b"\n")
+            else:
+                out.write(encode(payload, fmt))
+            n += 1
+    finally:
+        if writer is not None:
+            writer.close()
+        if out is not raw:
+            out.close()
+        if isinstance(target, str):
+            raw.close()
+        else:
+            raw.flush()
+    return n
@@ -1,63 +1,56 @@
 import pandas as pd
 import numpy as np
+from scoring import ScoringEngine
+from metadata_store import load_metadata
+from sampling import weighted_sample
 
 # =========================
 # CONFIG
 # =========================
-METADATA_PATH = "column_metadata.csv"
+METADATA_PATH = "column_metadata.parquet"  # cae a column_metadata.csv si no existe
 MAX_COLS = 5
 TOP_N_FOR_RANDOM = 20
+MAX_PER_LABEL = None  # máximo de columnas con la misma primary_label (None = sin límite)
+SEED = None  # entero -> selección reproducible
 
 # =========================
 # CARGAR METADATA
 # =========================
-meta_df = pd.read_csv(METADATA_PATH)
+metadata = load_metadata(METADATA_PATH)
+scoring_engine = ScoringEngine(metadata)
 
 # =========================
 # FUNCIÓN DE SCORING BASADA EN PRIORIDADES NUMÉRICAS
 # =========================
-def compute_score_from_priorities(meta_df, user_scores):
+def compute_score_from_priorities(metadata, user_scores, engine=None):
     """
     user_scores: dict con dimensiones y su importancia
     Ej: {"cultural":10, "economic":10, "mental":10, "physical":8.8, "social":10, "environmental":10}
+    metadata: ColumnMetadata (o DataFrame de metadata)
+    engine: ScoringEngine ya construido sobre metadata (se crea uno si no se pasa)
     """
-    df = meta_df.copy()
-    df["dynamic_score"] = 0.0
-    
-    # Normalizar las puntuaciones del usuario a 0-1
-    max_score = max(user_scores.values())
-    user_norm = {k: v/max_score for k, v in user_scores.items()}
-    
-    for idx, row in df.iterrows():
-        score = 0.0
-        # 1️⃣ Coincidencia con primary_label
-        primary = row["primary_label"].lower()
-        if primary in user_norm:
-            score += row["confidence"] * user_norm[primary]
-        
-        # 2️⃣ Coincidencia con secondary_labels
-        for sec in row["secondary_labels"]:
-            sec = sec.lower()
-            if sec in user_norm:
-                score += 0.5 * row["confidence"] * user_norm[sec]  # peso menor para secundarias
-        
-        df.at[idx, "dynamic_score"] = score
+    if engine is None:
+        engine = ScoringEngine(metadata)
 
     # Orden descendente
-    df = df.sort_values("dynamic_score", ascending=False)
-    return df
+    return engine.scored_frame(user_scores)
 
 # =========================
 # FUNCIÓN DE SELECCIÓN CON ALEATORIEDAD
 # =========================
-def select_columns_with_randomness(df, max_cols=MAX_COLS, top_n=TOP_N_FOR_RANDOM):
-    df_top = df.head(top_n).copy() if len(df) > top_n else df.copy()
-    scores = df_top["dynamic_score"].values
-    probs = scores / scores.sum() if scores.sum() > 0 else np.ones(len(scores))/len(scores)
-    
-    n_select = min(max_cols, len(df_top))
-    selected_indices = np.random.choice(len(df_top), size=n_select, replace=False, p=probs)
-    return df_top.iloc[selected_indices]["column"].tolist()
+def select_columns_with_randomness(df, max_cols=MAX_COLS, top_n=TOP_N_FOR_RANDOM, seed=SEED, max_per_label=MAX_PER_LABEL):
+    """
+    Muestreo ponderado por dynamic_score entre las top_n columnas (df ya ordenado)
+
+    seed: entero o np.random.Generator; la misma semilla repite la selección
+    max_per_label: máximo de columnas con la misma primary_label
+    """
+    df_top = df.head(top_n)
+    scores = df_top["dynamic_score"].to_numpy(dtype=np.float64)
+    labels = pd.factorize(df_top["primary_label"])[0] if max_per_label is not None else None
+
+    selected_indices = weighted_sample(scores, max_cols, seed, labels, max_per_label)
+    return df_top["column"].iloc[selected_indices].tolist()
 
 # =========================
 # EJEMPLO DE USUARIO
@@ -71,7 +64,7 @@ user_scores = {
     "social wellbeing": 10
 }
 
-scored_df = compute_score_from_priorities(meta_df, user_scores)
+scored_df = compute_score_from_priorities(metadata, user_scores, scoring_engine)
 selected_columns = select_columns_with_randomness(scored_df)
 
 for col in selected_columns:
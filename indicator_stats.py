@@ -0,0 +1,282 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence
+
+from quality_index import CHUNK_COLS, MIN_COMPLETENESS, MIN_POINTS, quality_matrices, sorted_by_geo_time
+
+# =========================
+# CONFIG
+# =========================
+RANKS_PATH = "indicator_ranks.npy"  # uint8 (años × países × indicadores), percentil 0-100
+TRENDS_PATH = "indicator_trends.npy"  # float32 (campos × países × indicadores)
+INDEX_PATH = "indicator_stats.json"  # geos, años, columnas y campos (posición en los arrays)
+PREFERRED_START_YEAR = 2000
+MAX_YEAR = 2025
+NO_RANK = 255  # celda sin dato en el cubo de percentiles
+
+TREND_FIELDS = [
+    "latest_year", "latest_value",  # último dato hasta MAX_YEAR
+    "first_year", "first_value",  # primer dato de la ventana
+    "last_year", "last_value",  # último dato de la ventana
+    "slope", "cagr", "n_points", "completeness",
+]
+
+
+def trend_matrices(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+) -> Dict:
+    """
+    Estadísticas de tendencia por (geo, indicador) con operaciones de arrays.
+
+    La ventana es la de analyze_column_quality (años preferidos, o todos los
+    años si el país no tiene filas en ese rango):
+
+    - slope: pendiente por mínimos cuadrados (unidades por año) en la ventana
+    - cagr: tasa de crecimiento anual compuesta entre el primer y el último
+      dato de la ventana (solo si ambos son > 0 y de años distintos)
+    - latest_*: último dato no nulo hasta end_year (aunque sea anterior a la ventana)
+
+    Returns:
+        {"geos": array de códigos, "columns": lista, "usable": matriz bool,
+         campo de TREND_FIELDS: matriz float64 (n_geos, n_columnas)}
+    """
+    columns = [c for c in columns if c in df.columns]
+    if len(df) == 0 or not columns:
+        empty = np.zeros((0, len(columns)))
+        return {"geos": np.array([], dtype=object), "columns": columns,
+                "usable": empty.astype(bool), **{field: empty for field in TREND_FIELDS}}
+
+    df = sorted_by_geo_time(df)
+    q = quality_matrices(df, columns, start_year, end_year, MIN_COMPLETENESS, MIN_POINTS)
+
+    time = q["time"]
+    geo = df["geo"].astype(str).str.lower().to_numpy()
+    starts = np.flatnonzero(np.r_[True, geo[1:] != geo[:-1]])
+    positions = np.arange(len(df))
+
+    # Filas de la ventana usada por cada país (tramo contiguo [used_start, used_end))
+    rows_per_geo = np.diff(np.r_[starts, len(df)])
+    used_start = np.repeat(q["used_start"], rows_per_geo)
+    used_end = np.repeat(q["used_end"], rows_per_geo)
+    used = (positions >= used_start) & (positions < used_end)
+
+    # Por bloques de CHUNK_COLS columnas (como quality_matrices), así la memoria no crece con el catálogo
+    parts = {field: [] for field in TREND_FIELDS if field != "completeness"}
+    for i in range(0, len(columns), CHUNK_COLS):
+        chunk = _trend_chunk(df[columns[i:i + CHUNK_COLS]], time, starts, used, start_year, end_year)
+        for field, matrix in chunk.items():
+            parts[field].append(matrix)
+
+    return {
+        "geos": q["geos"],
+        "columns": columns,
+        "usable": q["usable"],
+        **{field: np.hstack(matrices) for field, matrices in parts.items()},
+        "completeness": q["matrices"]["completeness"],
+    }
+
+
+def _trend_chunk(frame: pd.DataFrame, time: np.ndarray, starts: np.ndarray, used: np.ndarray,
+                 start_year: int, end_year: int) -> Dict[str, np.ndarray]:
+    """Campos de TREND_FIELDS (salvo completeness) para un bloque de columnas"""
+    values = np.column_stack([
+        pd.to_numeric(frame[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan) for c in frame.columns
+    ])
+    notna = np.isfinite(values)
+    w = notna & used[:, None]
+    positions = np.arange(len(frame))
+    col_ids = np.arange(values.shape[1])
+
+    def point(pos: np.ndarray, found: np.ndarray):
+        safe = np.where(found, pos, 0)
+        return np.where(found, time[safe], np.nan), np.where(found, values[safe, col_ids], np.nan)
+
+    # Último dato hasta end_year; primer y último dato de la ventana
+    latest = np.maximum.reduceat(np.where(notna & (time <= end_year)[:, None], positions[:, None], -1), starts, axis=0)
+    first = np.minimum.reduceat(np.where(w, positions[:, None], len(frame)), starts, axis=0)
+    last = np.maximum.reduceat(np.where(w, positions[:, None], -1), starts, axis=0)
+    latest_year, latest_value = point(latest, latest >= 0)
+    first_year, first_value = point(first, first < len(frame))
+    last_year, last_value = point(last, last >= 0)
+
+    # Pendiente por mínimos cuadrados con sumas por tramo (años centrados en start_year)
+    t = np.where(w, (time - start_year)[:, None], 0).astype(np.float64)
+    v = np.where(w, values, 0.0)
+    n = np.add.reduceat(w.astype(np.float64), starts, axis=0)
+    st, sv = np.add.reduceat(t, starts, axis=0), np.add.reduceat(v, starts, axis=0)
+    stt, stv = np.add.reduceat(t * t, starts, axis=0), np.add.reduceat(t * v, starts, axis=0)
+    denom = n * stt - st * st
+
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        slope = np.where((n >= 2) & (denom > 0), (n * stv - st * sv) / denom, np.nan)
+        years = last_year - first_year
+        valid = (years > 0) & (first_value > 0) & (last_value > 0)
+        cagr = np.where(valid, (last_value / first_value) ** (1.0 / years) - 1.0, np.nan)
+
+    return {
+        "latest_year": latest_year,
+        "latest_value": latest_value,
+        "first_year": first_year,
+        "first_value": first_value,
+        "last_year": last_year,
+        "last_value": last_value,
+        "slope": slope,
+        "cagr": cagr,
+        "n_points": n,
+    }
+
+
+def percentile_ranks(df: pd.DataFrame, columns: Sequence[str], end_year: int = MAX_YEAR) -> Dict:
+    """
+    Percentil (0-100) de cada país entre los países con dato, por (indicador, año).
+
+    Percentil = rank promedio / n (los empates comparten percentil), como
+    pandas rank(pct=True). Se guarda redondeado en uint8; NO_RANK = sin dato.
+
+    Returns:
+        {"geos", "years", "columns", "ranks": uint8 (n_años, n_geos, n_columnas)}
+    """
+    columns = [c for c in columns if c in df.columns]
+    df = df[df["time"] <= end_year]
+    geo = df["geo"].astype(str).str.lower().to_numpy()
+    time = df["time"].to_numpy(dtype=np.int64)
+
+    geo_codes, geos = pd.factorize(geo, sort=True)
+    year_codes, years = pd.factorize(time, sort=True)
+
+    ranks = np.full((len(years), len(geos), len(columns)), NO_RANK, dtype=np.uint8)
+    if len(df) and columns:
+        values = df[columns].apply(pd.to_numeric, errors="coerce")
+        pct = values.groupby(time).rank(pct=True, method="average").to_numpy(dtype=np.float64, na_value=np.nan)
+        ranks[year_codes, geo_codes] = np.where(np.isfinite(pct), np.rint(pct * 100), NO_RANK).astype(np.uint8)
+
+    return {
+        "geos": np.asarray(geos, dtype=object),
+        "years": np.asarray(years, dtype=np.int64),
+        "columns": columns,
+        "ranks": ranks,
+    }
+
+
+def _save_npy(path: str, array: np.ndarray):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def build_indicator_stats(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+) -> "IndicatorStats":
+    """Percentiles y tendencias sobre la tabla merged (mismos países e indicadores en ambos)"""
+    if columns is None:
+        columns = [c for c in df.columns if c not in ("geo", "time")]
+
+    ranks = percentile_ranks(df, columns, end_year)
+    trends = trend_matrices(df, ranks["columns"], start_year, end_year)
+
+    # Alinear los países de las tendencias con los del cubo de percentiles (ordenados)
+    trend_index = {g: i for i, g in enumerate(trends["geos"])}
+    rows = np.array([trend_index.get(g, -1) for g in ranks["geos"]], dtype=np.int64)
+    cube = np.full((len(TREND_FIELDS), len(ranks["geos"]), len(ranks["columns"])), np.nan, dtype=np.float32)
+    for f, field in enumerate(TREND_FIELDS):
+        cube[f, rows >= 0] = trends[field][rows[rows >= 0]]
+
+    return IndicatorStats(ranks["geos"], ranks["years"], ranks["columns"], ranks["ranks"], cube,
+                          window=(start_year, end_year))
+
+
+class IndicatorStats:
+    """
+    Percentiles por (indicador, año) y tendencias por (país, indicador).
+
+    Los dos arrays se indexan por posición con diccionarios geo/año/columna,
+    así cada consulta es un lookup O(1); load() los abre con memmap.
+    """
+
+    def __init__(self, geos: Sequence[str], years: Sequence[int], columns: Sequence[str],
+                 ranks: np.ndarray, trends: np.ndarray, window=(PREFERRED_START_YEAR, MAX_YEAR)):
+        self.geos = [str(g) for g in geos]
+        self.years = [int(y) for y in years]
+        self.columns = list(columns)
+        self.geo_index: Dict[str, int] = {g: i for i, g in enumerate(self.geos)}
+        self.year_index: Dict[int, int] = {y: i for i, y in enumerate(self.years)}
+        self.col_index: Dict[str, int] = {c: i for i, c in enumerate(self.columns)}
+        self.field_index: Dict[str, int] = {f: i for i, f in enumerate(TREND_FIELDS)}
+        self.ranks = ranks
+        self.trends = trends
+        self.window = tuple(window)
+
+    def save(self, ranks_path: str = RANKS_PATH, trends_path: str = TRENDS_PATH, index_path: str = INDEX_PATH):
+        _save_npy(ranks_path, np.ascontiguousarray(self.ranks, dtype=np.uint8))
+        _save_npy(trends_path, np.ascontiguousarray(self.trends, dtype=np.float32))
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"geos": self.geos, "years": self.years, "columns": self.columns,
+                       "fields": TREND_FIELDS, "window": list(self.window)}, f)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, ranks_path: str = RANKS_PATH, trends_path: str = TRENDS_PATH,
+             index_path: str = INDEX_PATH, mmap: bool = True) -> "IndicatorStats":
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index["fields"] != TREND_FIELDS:
+            raise ValueError(f"{index_path} fue generado con otros campos; reconstruir con indicator_stats.py")
+        mode = "r" if mmap else None
+        return cls(index["geos"], index["years"], index["columns"],
+                   np.load(ranks_path, mmap_mode=mode), np.load(trends_path, mmap_mode=mode), index["window"])
+
+    def percentile(self, geo: str, column: str, year: Optional[int] = None) -> Optional[int]:
+        """
+        Percentil (0-100) del país en un indicador y año.
+
+        Sin año se usa el año del último dato del país (latest_year). None si
+        no hay dato.
+        """
+        g = self.geo_index.get(geo.lower())
+        c = self.col_index.get(column)
+        if g is None or c is None:
+            return None
+        if year is None:
+            latest = self.trends[self.field_index["latest_year"], g, c]
+            if np.isnan(latest):
+                return None
+            year = int(latest)
+        y = self.year_index.get(int(year))
+        if y is None:
+            return None
+        rank = int(self.ranks[y, g, c])
+        return None if rank == NO_RANK else rank
+
+    def trend(self, geo: str, column: str) -> Optional[Dict]:
+        """Tendencia del país en un indicador (campos de TREND_FIELDS; NaN -> None)"""
+        g = self.geo_index.get(geo.lower())
+        c = self.col_index.get(column)
+        if g is None or c is None:
+            return None
+        values = self.trends[:, g, c].tolist()
+        out = {field: (None if np.isnan(v) else v) for field, v in zip(TREND_FIELDS, values)}
+        for field in ("latest_year", "first_year", "last_year", "n_points"):
+            if out[field] is not None:
+                out[field] = int(out[field])
+        return {"column": column, **out, "percentile": self.percentile(geo, column)}
+
+
+# Ejecutar desde la raíz del repo tras reconstruir la tabla merged
+if __name__ == "__main__":
+    from data.storage import MERGED_PATH, read_merged
+
+    print("Building indicator stats...")
+    stats = build_indicator_stats(read_merged(MERGED_PATH))
+    stats.save()
+    print(f"Indicator stats saved to {RANKS_PATH} / {TRENDS_PATH} "
+          f"({len(stats.geos)} countries, {len(stats.years)} years, {len(stats.columns)} indicators)")
@@ -0,0 +1,118 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Registro de la request en curso; cada hilo / tarea asyncio ve el suyo
+_current: ContextVar[Optional[Dict]] = ContextVar("recommendation_record", default=None)
+
+
+class Instrumentation:
+    """
+    Timers por etapa y contadores del pipeline de recomendación.
+
+    Cada request abre un registro (`request()`); `timer()` y `count()` suman
+    sobre el registro activo y al cerrar la request se acumula en los totales
+    y se envía al sink (si hay). Con verbose=False no se imprime nada.
+    """
+
+    def __init__(self, verbose: bool = True, sink: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            verbose: imprimir los mensajes de progreso (log())
+            sink: recibe un dict por request: stages (segundos), counters, total_s
+        """
+        self.verbose = verbose
+        self.sink = sink
+        self._lock = threading.Lock()
+        self.reset()
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    @contextmanager
+    def request(self, **fields):
+        """Agrupa los timers/contadores de una request en un registro"""
+        record = {"event": "recommendation", **fields, "stages": {}, "counters": {}}
+        token = _current.set(record)
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total_s"] = time.perf_counter() - t0
+            _current.reset(token)
+            self._emit(record)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Suma el tiempo del bloque a la etapa (se acumula si la etapa se repite)"""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            record = _current.get()
+            if record is not None:
+                record["stages"][stage] = record["stages"].get(stage, 0.0) + elapsed
+            else:
+                with self._lock:
+                    self._stages[stage] += elapsed
+
+    def count(self, name: str, n: int = 1):
+        record = _current.get()
+        if record is not None:
+            record["counters"][name] = record["counters"].get(name, 0) + n
+        else:
+            with self._lock:
+                self._counters[name] += n
+
+    def _emit(self, record: Dict):
+        with self._lock:
+            self._requests += 1
+            self._total_s += record["total_s"]
+            for stage, seconds in record["stages"].items():
+                self._stages[stage] += seconds
+            for name, n in record["counters"].items():
+                self._counters[name] += n
+
+        if self.sink is not None:
+            try:
+                self.sink(record)
+            except Exception:
+                logger.exception("Metrics sink failed")
+
+    def reset(self):
+        with self._lock:
+            self._requests = 0
+            self._total_s = 0.0
+            self._stages: Dict[str, float] = defaultdict(float)
+            self._counters: Dict[str, int] = defaultdict(int)
+
+    def stats(self) -> Dict:
+        """Totales acumulados desde el último reset()"""
+        with self._lock:
+            n = self._requests
+            return {
+                'requests': n,
+                'total_s': self._total_s,
+                'stages_s': dict(self._stages),
+                'stages_mean_ms': {s: v * 1000 / n for s, v in self._stages.items()} if n else {},
+                'counters': dict(self._counters),
+            }
+
+
+def logging_sink(log: Optional[logging.Logger] = None, level: int = logging.INFO) -> Callable[[Dict], None]:
+    """Sink que escribe cada registro como una línea JSON en un logger"""
+    log = log or logger
+
+    def sink(record: Dict):
+        log.log(level, json.dumps(record, default=str))
+
+    return sink
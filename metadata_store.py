@@ -0,0 +1,207 @@
+import ast
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# =========================
+# CONFIG
+# =========================
+METADATA_PATH = "column_metadata.parquet"  # listas nativas, sin strings a parsear
+LEGACY_METADATA_PATH = "column_metadata.csv"  # listas guardadas como repr de Python
+MAX_SECONDARY = 2  # etiquetas secundarias por columna
+MAX_CONFIDENCES = 3  # confidences guardadas por columna (primaria + secundarias)
+
+
+def parse_labels(value) -> List[str]:
+    """Convierte una lista (o su representación en texto) a labels en minúsculas"""
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(v).lower() for v in value]
+    return []
+
+
+def _parse_floats(value) -> List[float]:
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [float(v) for v in value]
+    return []
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class ColumnMetadata:
+    """
+    Metadata de columnas parseada una sola vez y de solo lectura.
+
+    Las etiquetas se guardan como ids enteros sobre un vocabulario ordenado
+    (`labels`) y las confidences como arrays float32:
+
+        primary          int16 (n,)                 id de la etiqueta primaria
+        secondary        int16 (n, MAX_SECONDARY)   ids secundarios, -1 = vacío
+        confidence       float32 (n,)
+        all_confidences  float32 (n, MAX_CONFIDENCES), NaN = vacío
+    """
+
+    __slots__ = (
+        "columns", "column_index", "labels", "label_index", "primary", "secondary",
+        "confidence", "all_confidences", "descriptions", "units", "tags", "_frame", "_lock",
+    )
+
+    def __init__(self, columns, labels, primary, secondary, confidence, all_confidences,
+                 descriptions, units, tags):
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.column_index: Mapping[str, int] = MappingProxyType({c: i for i, c in enumerate(self.columns)})
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self.label_index: Mapping[str, int] = MappingProxyType({l: i for i, l in enumerate(self.labels)})
+        self.primary = _frozen(np.asarray(primary, dtype=np.int16))
+        self.secondary = _frozen(np.asarray(secondary, dtype=np.int16).reshape(len(self.columns), MAX_SECONDARY))
+        self.confidence = _frozen(np.asarray(confidence, dtype=np.float32))
+        self.all_confidences = _frozen(
+            np.asarray(all_confidences, dtype=np.float32).reshape(len(self.columns), MAX_CONFIDENCES)
+        )
+        self.descriptions: Tuple[str, ...] = tuple(descriptions)
+        self.units: Tuple[str, ...] = tuple(units)
+        self.tags: Tuple[Tuple[str, ...], ...] = tuple(tuple(t) for t in tags)
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ColumnMetadata":
+        """Construye la estructura desde un DataFrame con listas nativas o en texto (CSV antiguo)"""
+        df = df.reset_index(drop=True)
+        n = len(df)
+
+        primary = df["primary_label"].astype(str).str.lower().tolist()
+        secondary = [parse_labels(v)[:MAX_SECONDARY] for v in df["secondary_labels"]]
+        labels = sorted(set(primary) | {s for row in secondary for s in row})
+        label_index = {l: i for i, l in enumerate(labels)}
+
+        secondary_ids = np.full((n, MAX_SECONDARY), -1, dtype=np.int16)
+        for i, row in enumerate(secondary):
+            secondary_ids[i, :len(row)] = [label_index[s] for s in row]
+
+        all_confidences = np.full((n, MAX_CONFIDENCES), np.nan, dtype=np.float32)
+        if "all_confidences" in df.columns:
+            for i, value in enumerate(df["all_confidences"]):
+                scores = _parse_floats(value)[:MAX_CONFIDENCES]
+                all_confidences[i, :len(scores)] = scores
+
+        confidence = pd.to_numeric(df["confidence"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float32)
+
+        def text_column(name):
+            if name not in df.columns:
+                return [""] * n
+            return df[name].fillna("").astype(str).tolist()
+
+        tags = [parse_labels(v) for v in df["tags"]] if "tags" in df.columns else [[] for _ in range(n)]
+
+        return cls(
+            columns=df["column"].astype(str).tolist(),
+            labels=labels,
+            primary=[label_index[p] for p in primary],
+            secondary=secondary_ids,
+            confidence=confidence,
+            all_confidences=all_confidences,
+            descriptions=text_column("description"),
+            units=text_column("unit"),
+            tags=tags,
+        )
+
+    def secondary_labels(self, i: int) -> List[str]:
+        return [self.labels[j] for j in self.secondary[i] if j >= 0]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Vista tabular (una fila por columna, listas nativas) construida una vez.
+
+        Se comparte entre llamadas: copiarla antes de modificarla.
+        """
+        with self._lock:
+            if self._frame is None:
+                n = len(self.columns)
+                self._frame = pd.DataFrame({
+                    "column": list(self.columns),
+                    "primary_label": [self.labels[j] for j in self.primary],
+                    "secondary_labels": [self.secondary_labels(i) for i in range(n)],
+                    "confidence": self.confidence.astype(np.float64),
+                    "all_confidences": [
+                        [float(s) for s in row if not np.isnan(s)] for row in self.all_confidences
+                    ],
+                    "description": list(self.descriptions),
+                    "unit": list(self.units),
+                    "tags": [list(t) for t in self.tags],
+                })
+            return self._frame
+
+
+def write_metadata(df: pd.DataFrame, path: str = METADATA_PATH):
+    """Guarda la metadata en Parquet con columnas de listas nativas"""
+    meta = ColumnMetadata.from_frame(df)
+    frame = meta.frame()
+
+    table = pa.table({
+        "column": pa.array(frame["column"], pa.string()),
+        "primary_label": pa.array(frame["primary_label"], pa.string()),
+        "secondary_labels": pa.array(frame["secondary_labels"], pa.list_(pa.string())),
+        "confidence": pa.array(meta.confidence, pa.float32()),
+        "all_confidences": pa.array(frame["all_confidences"], pa.list_(pa.float32())),
+        "description": pa.array(frame["description"], pa.string()),
+        "unit": pa.array(frame["unit"], pa.string()),
+        "tags": pa.array(frame["tags"], pa.list_(pa.string())),
+    })
+
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_metadata(path: str = METADATA_PATH) -> ColumnMetadata:
+    """
+    Lee la metadata sin cache.
+
+    Si no existe el Parquet se lee el CSV antiguo (parseando las listas en texto).
+    """
+    if os.path.exists(path) and path.endswith(".parquet"):
+        return ColumnMetadata.from_frame(pq.read_table(path).to_pandas())
+
+    csv_path = path if path.endswith(".csv") else LEGACY_METADATA_PATH
+    return ColumnMetadata.from_frame(pd.read_csv(csv_path))
+
+
+_LOADED: Dict[str, ColumnMetadata] = {}
+_LOADED_LOCK = threading.Lock()
+
+
+def load_metadata(path: str = METADATA_PATH) -> ColumnMetadata:
+    """Metadata compartida por proceso: se lee y parsea solo la primera vez"""
+    key = os.path.abspath(path)
+    with _LOADED_LOCK:
+        if key not in _LOADED:
+            _LOADED[key] = read_metadata(path)
+        return _LOADED[key]
+
+
+if __name__ == "__main__":
+    # Convierte el CSV antiguo al formato con listas nativas
+    meta_df = pd.read_csv(LEGACY_METADATA_PATH)
+    write_metadata(meta_df, METADATA_PATH)
+    print(f"✅ {len(meta_df)} columnas guardadas en {METADATA_PATH}")
@@ -1,7 +1,18 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional
-from supabase import create_client, Client
+from typing import BinaryIO, Iterable, List, Dict, Optional, Set, Tuple, Union
+from scoring import ScoringEngine
+from semantic_index import INDEX_PATH as SEMANTIC_INDEX_PATH, SemanticIndex
+from metadata_store import ColumnMetadata, load_metadata
+from data_sources import DataSource, LocalDataSource, SupabaseDataSource
+from quality_index import (
+    QUALITY_INDEX_PATH, QualityIndex, analyze_quality, build_quality_index, quality_result, result_years,
+    series_slice,
+)
+from cache import CachedDataSource, CountryDataCache
+from sampling import RngLike, gumbel_top_k, make_rng, new_seed, weighted_sample
+from export import COMPRESSION, EXPORT_FORMAT, dumps_json, result_payload, write_export
+from instrumentation import Instrumentation
 import os
 import warnings
 warnings.filterwarnings('ignore')
@@ -11,209 +22,541 @@ warnings.filterwarnings('ignore')
 # ========================= 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "Supabase_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "Supabse_KEY")
-METADATA_PATH = "column_metadata.csv"
+METADATA_PATH = "column_metadata.parquet"  # cae a column_metadata.csv si no existe
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase")  # "supabase" o "local" (merged_output.parquet)
+VERBOSE = os.getenv("RECOMMENDER_VERBOSE", "1") != "0"  # "0" -> sin prints en el camino de la request
 
 # Configuración
 MAX_COLS = 5
 TOP_N_FOR_RANDOM = 20
+MAX_PER_LABEL = None  # máximo de columnas con la misma primary_label por selección (None = sin límite)
+MAX_REFILL_ROUNDS = 2  # rondas de reposición de columnas descartadas (cada una es una consulta)
 MIN_COMPLETENESS = 0.6
 PREFERRED_START_YEAR = 2000
 MAX_YEAR = 2025
 
 class SupabaseRecommender:
-    def __init__(self):
-        """Inicializa el sistema de recomendación con Supabase"""
-        print("🔌 Conectando a Supabase...")
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        
-        print("📋 Cargando metadata...")
-        self.metadata = pd.read_csv(METADATA_PATH)
-        
-        print("✅ Sistema inicializado\n")
+    def __init__(self, data_source: Optional[DataSource] = None, quality_index: Optional[QualityIndex] = None,
+                 cache: Optional[CountryDataCache] = None, metadata: Optional[ColumnMetadata] = None,
+                 instrumentation: Optional[Instrumentation] = None, semantic_index: Optional[SemanticIndex] = None):
+        """
+        Inicializa el sistema de recomendación
+
+        Args:
+            data_source: fuente de datos por país (por defecto Supabase;
+                usar LocalDataSource para trabajar sin red)
+            quality_index: estadísticas precalculadas por (geo, columna);
+                si se pasa, se evita recalcular la calidad en cada request
+            cache: cache LRU/TTL por (país, ventana, columna) delante de la fuente
+            metadata: metadata de columnas ya cargada (por defecto METADATA_PATH)
+            instrumentation: timers/contadores por request y modo silencioso
+                (por defecto Instrumentation(verbose=VERBOSE))
+            semantic_index: índice de texto libre sobre la metadata para los
+                intereses escritos por el usuario (por defecto SEMANTIC_INDEX_PATH
+                si existe, cargado la primera vez que se usa)
+        """
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation(verbose=VERBOSE)
+
+        if data_source is None:
+            self.log("🔌 Conectando a Supabase...")
+            data_source = SupabaseDataSource(SUPABASE_URL, SUPABASE_KEY)
+        self.cache = cache
+        self.data_source = CachedDataSource(data_source, cache) if cache is not None else data_source
+        self.quality_index = quality_index
+        
+        self.log("📋 Cargando metadata...")
+        self.metadata = metadata if metadata is not None else load_metadata(METADATA_PATH)
+        self.scoring = ScoringEngine(self.metadata)
+        self.semantic_index = semantic_index
+        
+        self.log("✅ Sistema inicializado\n")
     
-    def score_columns(self, user_scores: Dict[str, float]) -> pd.DataFrame:
-        """Puntúa columnas basado en prioridades del usuario"""
-        df = self.metadata.copy()
-        df["dynamic_score"] = 0.0
-        
-        # Normalizar scores del usuario
-        max_score = max(user_scores.values())
-        user_norm = {k.lower(): v/max_score for k, v in user_scores.items()}
-        
-        # Calcular score para cada columna
-        for idx, row in df.iterrows():
-            score = 0.0
-            
-            # Score por label primario
-            primary = str(row["primary_label"]).lower()
-            if primary in user_norm:
-                score += row["confidence"] * user_norm[primary]
-            
-            # Score por labels secundarios
-            if isinstance(row["secondary_labels"], str):
-                try:
-                    secondary_list = eval(row["secondary_labels"])
-                    for sec in secondary_list:
-                        sec = sec.lower()
-                        if sec in user_norm:
-                            score += 0.5 * row["confidence"] * user_norm[sec]
-                except:
-                    pass
-            
-            df.at[idx, "dynamic_score"] = score
+    def log(self, message: str):
+        """Mensaje de progreso (no se imprime en modo silencioso)"""
+        self.instrumentation.log(message)
+    
+    def score_columns(self, user_scores: Dict[str, float], interests: Optional[str] = None) -> pd.DataFrame:
+        """
+        Puntúa columnas basado en prioridades del usuario
         
-        return df.sort_values("dynamic_score", ascending=False)
+        Si se pasan intereses en texto libre ('child mortality, schools') y hay
+        índice semántico, su similitud con cada columna se suma al score.
+        """
+        text_scores = None
+        if interests:
+            if self.semantic_index is None and os.path.exists(SEMANTIC_INDEX_PATH):
+                self.semantic_index = SemanticIndex.load(SEMANTIC_INDEX_PATH)
+            if self.semantic_index is not None:
+                text_scores = self.semantic_index.scores(interests, self.scoring.columns)
+        return self.scoring.scored_frame(user_scores, text_scores)
     
-    def select_columns(self, scored_df: pd.DataFrame, max_cols: int = MAX_COLS) -> List[str]:
-        """Selecciona columnas con aleatoriedad ponderada"""
-        df_top = scored_df.head(TOP_N_FOR_RANDOM).copy()
+    def _require_sync_source(self, api: str):
+        """Las fuentes solo async (AsyncSupabaseDataSource) no sirven para las APIs síncronas"""
+        if not self.data_source.supports_sync:
+            raise TypeError(f"{api}() necesita una fuente con fetch() síncrono; "
+                            f"con {type(self.data_source).__name__} usa get_recommendations_async()")
+    
+    def availability_known(self, country_code: str) -> bool:
+        """True si la disponibilidad del país se conoce sin consultar la fuente remota"""
+        if self.quality_index is not None and country_code.lower() in self.quality_index.geo_index:
+            return True
+        return self.data_source.local_source() is not None
+    
+    def usable_columns(self, country_code: str) -> Optional[Set[str]]:
+        """
+        Columnas con datos suficientes para un país
         
-        scores = df_top["dynamic_score"].values
-        probs = scores / scores.sum() if scores.sum() > 0 else np.ones(len(scores))/len(scores)
+        Usa el índice de calidad si cubre el país; con una fuente local (aunque
+        esté envuelta) lo calcula al vuelo sobre todas las columnas, así que
+        conviene llamarla una vez por request. Devuelve None si no se puede
+        saber sin consultar.
+        """
+        geo = country_code.lower()
+        index = self._batch_availability([geo]).get(geo)
+        if index is not None:
+            return set(np.asarray(index.columns)[index.usable[index.geo_index[geo]]])
+        return set() if self.availability_known(geo) else None
+    
+    def availability_mask(self, country_code: str, columns: List[str]) -> Optional[np.ndarray]:
+        """Máscara de columnas con datos suficientes para un país (None si no se sabe)"""
+        usable = self.usable_columns(country_code)
+        if usable is None:
+            return None
+        return np.array([c in usable for c in columns], dtype=bool)
+    
+    def select_columns(self, scored_df: pd.DataFrame, max_cols: int = MAX_COLS,
+                       country_code: Optional[str] = None, rng: RngLike = None,
+                       usable: Optional[Set[str]] = None) -> List[str]:
+        """
+        Selecciona columnas con aleatoriedad ponderada
         
-        n_select = min(max_cols, len(df_top))
-        selected_indices = np.random.choice(len(df_top), size=n_select, replace=False, p=probs)
+        Si se pasa country_code, el muestreo entre las TOP_N_FOR_RANDOM solo
+        considera columnas con datos suficientes para ese país.
         
-        return df_top.iloc[selected_indices]["column"].tolist()
+        Args:
+            rng: semilla o Generator de la request (None = entropía del sistema)
+            usable: columnas disponibles ya calculadas con usable_columns()
+                (evita recalcularlas en cada ronda de reposición)
+        """
+        if usable is None and country_code is not None:
+            usable = self.usable_columns(country_code)
+        if usable is not None:
+            scored_df = scored_df[scored_df["column"].isin(usable)]
+        
+        df_top = scored_df.head(TOP_N_FOR_RANDOM)
+        if len(df_top) == 0:
+            return []
+        
+        top_columns = df_top["column"].tolist()
+        labels = self.scoring.store.primary[[self.scoring.store.column_index[c] for c in top_columns]]
+        selected_indices = weighted_sample(df_top["dynamic_score"].to_numpy(dtype=np.float64), max_cols, rng,
+                                           labels, MAX_PER_LABEL)
+        return [top_columns[i] for i in selected_indices]
     
     def fetch_country_data(self, country_code: str, columns: List[str]) -> Optional[pd.DataFrame]:
         """
-        Obtiene datos de Supabase para un país y columnas específicas
+        Obtiene datos de la fuente de datos para un país y columnas específicas
         """
         try:
-            # Construir select con columnas necesarias
-            select_cols = ['geo', 'time'] + columns
-            select_str = ','.join(select_cols)
-            
-            print(f"🔍 Consultando Supabase para '{country_code}'...")
+            self.log(f"🔍 Consultando datos para '{country_code}'...")
             
-            # Query optimizada con filtros
-            response = (
-                self.supabase.table('country_data')
-                .select(select_str)
-                .eq('geo', country_code.lower())
-                .gte('time', PREFERRED_START_YEAR)
-                .lte('time', MAX_YEAR)
-                .order('time', desc=False)
-                .execute()
-            )
+            # Query con filtro de rango preferido
+            df = self.data_source.fetch(country_code, columns, PREFERRED_START_YEAR, MAX_YEAR)
             
-            if not response.data or len(response.data) == 0:
-                print(f"   ⚠️  No hay datos para '{country_code}' en rango {PREFERRED_START_YEAR}-{MAX_YEAR}")
+            if df is None or len(df) == 0:
+                self.log(f"   ⚠️  No hay datos para '{country_code}' en rango {PREFERRED_START_YEAR}-{MAX_YEAR}")
                 
                 # Intentar sin filtro de año
-                print(f"   🔄 Intentando con rango ampliado...")
-                response = (
-                    self.supabase.table('country_data')
-                    .select(select_str)
-                    .eq('geo', country_code.lower())
-                    .order('time', desc=False)
-                    .execute()
-                )
+                self.log(f"   🔄 Intentando con rango ampliado...")
+                self.instrumentation.count("fallback_queries")
+                df = self.data_source.fetch(country_code, columns)
                 
-                if not response.data:
-                    print(f"   ❌ No hay datos para '{country_code}'")
+                if df is None or len(df) == 0:
+                    self.log(f"   ❌ No hay datos para '{country_code}'")
                     return None
             
-            df = pd.DataFrame(response.data)
-            print(f"   ✅ {len(df)} registros obtenidos")
+            self.log(f"   ✅ {len(df)} registros obtenidos")
             return df
             
         except Exception as e:
-            print(f"   ❌ Error al consultar Supabase: {e}")
+            self.log(f"   ❌ Error al consultar datos: {e}")
+            self.instrumentation.count("fetch_errors")
             return None
     
-    def analyze_column_quality(self, df: pd.DataFrame, column: str) -> Optional[Dict]:
+    def analyze_column_quality(self, df: pd.DataFrame, column: str,
+                               country_code: Optional[str] = None) -> Optional[Dict]:
         """Analiza la calidad de datos de una columna"""
         if column not in df.columns:
             return None
         
-        # Filtrar por rango preferido
-        df_filtered = df[
-            (df['time'] >= PREFERRED_START_YEAR) & 
-            (df['time'] <= MAX_YEAR)
-        ].copy()
-        
-        # Si no hay datos en rango preferido, usar todos
-        if len(df_filtered) == 0:
-            df_filtered = df.copy()
+        # Estadísticas precalculadas: solo hay que recortar los datos
+        stats = None
+        if self.quality_index is not None and country_code is not None:
+            stats = self.quality_index.lookup(country_code, column)
+        if stats is not None:
+            return self._quality_from_stats(df, column, stats)
         
-        if len(df_filtered) == 0:
+        # Sin índice: análisis vectorizado (ventana preferida o todos los años)
+        results = analyze_quality(df, [column], PREFERRED_START_YEAR, MAX_YEAR, MIN_COMPLETENESS)
+        return next(iter(results.values()), None)
+    
+    @staticmethod
+    def _quality_from_stats(df: pd.DataFrame, column: str, stats: Dict) -> Optional[Dict]:
+        """Resultado de calidad a partir de estadísticas precalculadas (solo recorta los datos)"""
+        if not stats['usable'] or column not in df.columns:
             return None
+        first, last = result_years(stats, MIN_COMPLETENESS)
+        time, values = series_slice(df['time'].to_numpy(), df[column].to_numpy(), first, last)
+        return quality_result(column, first, last, stats['completeness'], time, values)
+    
+    def _analyze_columns(self, df_country: pd.DataFrame, columns: List[str], country_code: str) -> List[Dict]:
+        """Analiza la calidad de cada columna y descarta las que no tienen datos suficientes"""
+        qualities, pending = {}, []
+        for col in columns:
+            stats = None
+            if self.quality_index is not None and country_code is not None:
+                stats = self.quality_index.lookup(country_code, col)
+            if stats is not None:
+                qualities[col] = self._quality_from_stats(df_country, col, stats)
+            else:
+                pending.append(col)
+        
+        # Columnas sin estadísticas precalculadas: todas a la vez
+        if pending:
+            analyzed = analyze_quality(df_country, pending, PREFERRED_START_YEAR, MAX_YEAR, MIN_COMPLETENESS)
+            qualities.update({col: quality for (_, col), quality in analyzed.items()})
         
-        # Análisis de completitud
-        non_null = df_filtered[column].notna()
-        completeness = non_null.sum() / len(df_filtered) if len(df_filtered) > 0 else 0
-        
-        # Si muy baja completitud, buscar mejor rango continuo
-        if completeness < MIN_COMPLETENESS:
-            df_non_null = df_filtered[non_null].copy()
-            if len(df_non_null) < 5:  # Mínimo 5 puntos
-                return None
+        results = []
+        for col in columns:
+            quality = qualities.get(col)
             
-            start_year = int(df_non_null['time'].min())
-            end_year = int(df_non_null['time'].max())
-            data = df_non_null[['time', column]].copy()
-        else:
-            # Usar rango completo
-            start_year = int(df_filtered['time'].min())
-            end_year = int(df_filtered['time'].max())
-            data = df_filtered[non_null][['time', column]].copy()
+            if quality is None:
+                self.log(f"   ⚠️  '{col}' - Datos insuficientes")
+                self.instrumentation.count("dropped_columns")
+                continue
+            
+            results.append(quality)
+            self.log(f"   ✅ '{col}' - {quality['start_year']}-{quality['end_year']} ({quality['completeness']*100:.1f}%)")
         
-        return {
-            'column': column,
-            'start_year': start_year,
-            'end_year': end_year,
-            'completeness': float(completeness),
-            'data_points': len(data),
-            'data': data
-        }
+        return results
     
-    def get_recommendations(self, country_code: str, user_scores: Dict[str, float]) -> Optional[Dict]:
+    def get_recommendations(self, country_code: str, user_scores: Dict[str, float],
+                            country_aware: bool = True, interests: Optional[str] = None,
+                            seed: Optional[int] = None) -> Optional[Dict]:
         """
         Pipeline completo de recomendación
         
         Args:
             country_code: Código del país (ej: 'esp', 'usa')
             user_scores: Dict con prioridades del usuario
+            country_aware: si True, solo se muestrean columnas con datos para el
+                país y se reponen las descartadas (hasta MAX_REFILL_ROUNDS rondas)
+                cuando la disponibilidad del país se conoce sin consultar
+            interests: intereses en texto libre que se mezclan con las prioridades
+            seed: semilla del muestreo; la misma semilla (y los mismos datos)
+                repite la selección. Sin semilla se genera una nueva
             
         Returns:
-            Dict con recomendaciones y datos
+            Dict con recomendaciones y datos ('seed' permite repetir el resultado)
         """
-        print("=" * 80)
-        print(f"🚀 ANÁLISIS PARA: {country_code.upper()}")
-        print("=" * 80)
-        
-        # 1. Scoring y selección de columnas (en memoria - rápido)
-        print("\n1️⃣ Puntuando columnas...")
-        scored_df = self.score_columns(user_scores)
-        selected_columns = self.select_columns(scored_df)
-        print(f"   ✅ Seleccionadas: {selected_columns}")
+        self._require_sync_source("get_recommendations")
+        seed = new_seed() if seed is None else seed
+        rng = make_rng(seed)
+        with self.instrumentation.request(country=country_code.lower()):
+            self.log("=" * 80)
+            self.log(f"🚀 ANÁLISIS PARA: {country_code.upper()}")
+            self.log("=" * 80)
+            
+            # 1. Scoring y selección de columnas (en memoria - rápido)
+            self.log("\n1️⃣ Puntuando columnas...")
+            with self.instrumentation.timer("score"):
+                scored_df = self.score_columns(user_scores, interests)
+            with self.instrumentation.timer("select"):
+                usable = self.usable_columns(country_code) if country_aware else None
+                selected_columns = self.select_columns(scored_df, rng=rng, usable=usable)
+            self.log(f"   ✅ Seleccionadas: {selected_columns}")
+            
+            # 2. Obtener datos de la fuente (Supabase o local)
+            self.log("\n2️⃣ Obteniendo datos...")
+            with self.instrumentation.timer("fetch"):
+                df_country = self.fetch_country_data(country_code, selected_columns)
+            
+            if df_country is None:
+                self.log("\n❌ No se pudieron obtener datos")
+                return None
+            
+            # 3. Analizar calidad de cada columna
+            self.log("\n3️⃣ Analizando calidad de datos...")
+            with self.instrumentation.timer("quality"):
+                results = self._analyze_columns(df_country, selected_columns, country_code)
+            
+            # Reponer columnas descartadas con otras candidatas del país; solo si
+            # la disponibilidad se conoce (sin índice, una sola consulta como antes)
+            tried = set(selected_columns)
+            rounds = MAX_REFILL_ROUNDS if usable is not None else 0
+            while rounds > 0 and len(results) < MAX_COLS:
+                rounds -= 1
+                remaining = scored_df[~scored_df["column"].isin(tried)]
+                with self.instrumentation.timer("select"):
+                    refill = self.select_columns(remaining, MAX_COLS - len(results), rng=rng, usable=usable)
+                if not refill:
+                    break
+                
+                self.log(f"   🔄 Reponiendo con: {refill}")
+                self.instrumentation.count("refill_queries")
+                tried.update(refill)
+                selected_columns = selected_columns + refill
+                with self.instrumentation.timer("fetch"):
+                    df_refill = self.fetch_country_data(country_code, refill)
+                if df_refill is not None:
+                    with self.instrumentation.timer("quality"):
+                        results += self._analyze_columns(df_refill, refill, country_code)
+            
+            with self.instrumentation.timer("summary"):
+                result = self._build_result(country_code, selected_columns, results)
+            if result is not None:
+                result['seed'] = seed
+            return result
+    
+    # =========================
+    # BATCH: varios países × varios perfiles
+    # =========================
+    def _batch_availability(self, country_codes: List[str]) -> Dict[str, QualityIndex]:
+        """
+        Índice de calidad que cubre cada país del batch (como usable_columns)
         
-        # 2. Obtener datos de Supabase
-        print("\n2️⃣ Obteniendo datos de Supabase...")
-        df_country = self.fetch_country_data(country_code, selected_columns)
+        Los países del índice precalculado lo usan; con una fuente local el
+        resto se calcula de una vez para todos. Los que no aparecen no se
+        pueden filtrar sin consultar.
+        """
+        geos = sorted({c.lower() for c in country_codes})
+        covered = {}
+        if self.quality_index is not None:
+            covered = {g: self.quality_index for g in geos if g in self.quality_index.geo_index}
+        
+        pending = [g for g in geos if g not in covered]
+        source = self.data_source.local_source()
+        if pending and source is not None:
+            df = source.fetch_many(pending, self.scoring.columns)
+            if df is not None:
+                local = QualityIndex(build_quality_index(
+                    df, [c for c in self.scoring.columns if c in df.columns],
+                    PREFERRED_START_YEAR, MAX_YEAR, MIN_COMPLETENESS
+                ))
+                covered.update({g: local for g in local.geos})
+        
+        return covered
+    
+    def fetch_countries_data(self, country_codes: List[str], columns: List[str]) -> Optional[pd.DataFrame]:
+        """
+        Datos de varios países en una consulta (geo IN ...)
         
-        if df_country is None:
-            print("\n❌ No se pudieron obtener datos")
+        Los países sin filas en el rango preferido se piden juntos en una
+        segunda consulta sin filtro de año.
+        """
+        try:
+            self.log(f"🔍 Consultando datos para {len(country_codes)} países...")
+            df = self.data_source.fetch_many(country_codes, columns, PREFERRED_START_YEAR, MAX_YEAR)
+            
+            found = set() if df is None else set(df['geo'].astype(str).str.lower().unique())
+            missing = [c for c in country_codes if c.lower() not in found]
+            if missing:
+                self.log(f"   🔄 {len(missing)} países sin datos en {PREFERRED_START_YEAR}-{MAX_YEAR}, ampliando rango...")
+                self.instrumentation.count("fallback_queries")
+                extra = self.data_source.fetch_many(missing, columns)
+                if extra is not None and len(extra) > 0:
+                    df = extra if df is None else pd.concat([df, extra], ignore_index=True)
+            
+            if df is None or len(df) == 0:
+                return None
+            self.log(f"   ✅ {len(df)} registros obtenidos")
+            return df
+            
+        except Exception as e:
+            self.log(f"   ❌ Error al consultar datos: {e}")
+            self.instrumentation.count("fetch_errors")
             return None
+    
+    def _select_batch(self, scores: np.ndarray, usable: Optional[np.ndarray], tried: np.ndarray,
+                      need: np.ndarray, rng: np.random.Generator) -> Dict[Tuple[int, int], np.ndarray]:
+        """
+        Muestreo de columnas por (país, perfil), como select_columns
         
-        # 3. Analizar calidad de cada columna
-        print("\n3️⃣ Analizando calidad de datos...")
-        results = []
+        Todos los pares se muestrean juntos con gumbel_top_k (una fila por par).
         
-        for col in selected_columns:
-            quality = self.analyze_column_quality(df_country, col)
-            
-            if quality is None:
-                print(f"   ⚠️  '{col}' - Datos insuficientes")
+        Args:
+            scores: (n_perfiles, n_columnas)
+            usable: (n_países, n_columnas) o None si no se conoce la disponibilidad
+            tried: (n_países, n_perfiles, n_columnas) ya seleccionadas; se actualiza
+            need: (n_países, n_perfiles) columnas que faltan por par
+        """
+        pairs = np.argwhere(need > 0)
+        if len(pairs) == 0:
+            return {}
+        g, p = pairs[:, 0], pairs[:, 1]
+        
+        eligible = ~tried[g, p]
+        if usable is not None:
+            eligible &= usable[g]
+        chosen = gumbel_top_k(scores[p], need[g, p], rng, eligible, TOP_N_FOR_RANDOM,
+                              self.scoring.store.primary, MAX_PER_LABEL)
+        
+        picks = {}
+        for i, (gi, pi) in enumerate(pairs.tolist()):
+            row = chosen[i][chosen[i] >= 0]
+            if len(row):
+                tried[gi, pi, row] = True
+                picks[gi, pi] = row
+        return picks
+    
+    def _analyze_batch(self, df: Optional[pd.DataFrame], needed: Dict[str, Set[str]]) -> Dict[Tuple[str, str], Optional[Dict]]:
+        """
+        Calidad de los pares (país, columna) pedidos, agrupando por país
+        
+        Los países del índice precalculado solo recortan sus series; el resto
+        se analiza de una vez con analyze_quality (como _analyze_columns).
+        """
+        out = {(geo, col): None for geo, cols in needed.items() for col in cols}
+        if df is None or len(df) == 0:
+            return out
+        
+        df_geo = df['geo'].astype(str).str.lower()
+        covered = set()
+        if self.quality_index is not None:
+            covered = {g for g in needed if g in self.quality_index.geo_index}
+        
+        pending = {g: cols for g, cols in needed.items() if g not in covered}
+        if pending:
+            rows = df[df_geo.isin(list(pending))]
+            columns = sorted({col for cols in pending.values() for col in cols})
+            out.update(analyze_quality(rows, columns, PREFERRED_START_YEAR, MAX_YEAR, MIN_COMPLETENESS, needed=pending))
+        if not covered:
+            return out
+        
+        # Filas ordenadas por geo+time una sola vez; cada par es un slice de arrays
+        geo = df_geo.to_numpy()
+        order = np.lexsort((df['time'].to_numpy(dtype=np.int64), geo))
+        geo, time = geo[order], df['time'].to_numpy()[order]
+        starts = np.flatnonzero(np.r_[True, geo[1:] != geo[:-1]])
+        ends = np.r_[starts[1:], len(geo)]
+        values = {
+            col: df[col].to_numpy()[order]
+            for col in {col for g in covered for col in needed[g]} if col in df.columns
+        }
+        
+        for start, end in zip(starts, ends):
+            g = geo[start]
+            if g not in covered:
                 continue
-            
-            results.append(quality)
-            print(f"   ✅ '{col}' - {quality['start_year']}-{quality['end_year']} ({quality['completeness']*100:.1f}%)")
+            for col in needed[g]:
+                stats = self.quality_index.lookup(g, col)
+                if stats is None or not stats['usable'] or col not in values:
+                    continue
+                first, last = result_years(stats, MIN_COMPLETENESS)
+                t, v = series_slice(time[start:end], values[col][start:end], first, last)
+                out[g, col] = quality_result(col, first, last, stats['completeness'], t, v)
+        return out
+    
+    def get_recommendations_batch(self, country_codes: List[str], profiles: List[Dict[str, float]],
+                                  country_aware: bool = True, seed: Optional[int] = None) -> Dict[str, List[Optional[Dict]]]:
+        """
+        Recomendaciones para varios países y varios perfiles a la vez
+        
+        Puntúa todos los perfiles juntos, pide la unión de columnas de todos
+        los países en una sola consulta por ronda y analiza la calidad agrupada
+        por país. Cada ronda de reposición es también una única consulta.
         
+        Args:
+            seed: semilla del muestreo de todo el batch (None = entropía del sistema)
+        
+        Returns:
+            {country_code: [resultado de cada perfil, en el orden de profiles]}
+        """
+        self._require_sync_source("get_recommendations_batch")
+        columns = self.scoring.columns
+        geos = [c.lower() for c in country_codes]
+        n_geos, n_profiles = len(geos), len(profiles)
+        rng = make_rng(seed)
+        
+        with self.instrumentation.request(countries=n_geos, profiles=n_profiles):
+            with self.instrumentation.timer("score"):
+                scores = self.scoring.score_batch(profiles)
+            
+            with self.instrumentation.timer("select"):
+                usable = None
+                if country_aware:
+                    covered = self._batch_availability(geos)
+                    usable = np.ones((n_geos, len(columns)), dtype=bool)
+                    for g, geo in enumerate(geos):
+                        if geo in covered:
+                            usable[g] = covered[geo].usable_mask(geo, columns)
+                tried = np.zeros((n_geos, n_profiles, len(columns)), dtype=bool)
+                picks = self._select_batch(scores, usable, tried, np.full((n_geos, n_profiles), MAX_COLS), rng)
+            
+            selected = [[[] for _ in range(n_profiles)] for _ in range(n_geos)]
+            results = [[[] for _ in range(n_profiles)] for _ in range(n_geos)]
+            qualities: Dict[Tuple[str, str], Optional[Dict]] = {}
+            has_data = np.ones(n_geos, dtype=bool)
+            first_round = True
+            refill_rounds = 0
+            
+            while picks:
+                needed: Dict[str, Set[str]] = {}
+                for (g, _), chosen in picks.items():
+                    needed.setdefault(geos[g], set()).update(
+                        columns[c] for c in chosen if (geos[g], columns[c]) not in qualities
+                    )
+                needed = {geo: cols for geo, cols in needed.items() if cols}
+                
+                if needed:
+                    round_columns = sorted({col for cols in needed.values() for col in cols})
+                    with self.instrumentation.timer("fetch"):
+                        df = self.fetch_countries_data(list(needed), round_columns)
+                    with self.instrumentation.timer("quality"):
+                        qualities.update(self._analyze_batch(df, needed))
+                    
+                    if first_round:
+                        found = set() if df is None else set(df['geo'].astype(str).str.lower().unique())
+                        has_data = np.array([g in found for g in geos], dtype=bool)
+                first_round = False
+                
+                for (g, p), chosen in picks.items():
+                    if not has_data[g]:
+                        continue
+                    selected[g][p] += [columns[c] for c in chosen]
+                    for c in chosen:
+                        quality = qualities.get((geos[g], columns[c]))
+                        if quality is None:
+                            self.instrumentation.count("dropped_columns")
+                        else:
+                            results[g][p].append(quality)
+                
+                # Reponer columnas descartadas (una sola consulta para todos los pares),
+                # solo en países con disponibilidad conocida
+                if not country_aware or refill_rounds >= MAX_REFILL_ROUNDS:
+                    break
+                refill_rounds += 1
+                need = np.array([[MAX_COLS - len(r) for r in row] for row in results], dtype=np.int64).reshape(n_geos, n_profiles)
+                need[~has_data] = 0
+                need[[geo not in covered for geo in geos]] = 0
+                with self.instrumentation.timer("select"):
+                    picks = self._select_batch(scores, usable, tried, need, rng)
+                if picks:
+                    self.instrumentation.count("refill_queries")
+            
+            with self.instrumentation.timer("summary"):
+                output: Dict[str, List[Optional[Dict]]] = {}
+                for g, code in enumerate(country_codes):
+                    output[code] = [
+                        self._build_result(code, selected[g][p], results[g][p]) if has_data[g] else None
+                        for p in range(n_profiles)
+                    ]
+            return output
+    
+    def _build_result(self, country_code: str, selected_columns: List[str], results: List[Dict]) -> Optional[Dict]:
+        """Genera el resumen y el dict de salida a partir de las columnas analizadas"""
         if not results:
-            print("\n❌ Ninguna columna tiene datos suficientes")
+            self.log("\n❌ Ninguna columna tiene datos suficientes")
             return None
         
         # 4. Generar resumen
@@ -227,7 +570,7 @@ class SupabaseRecommender:
             'total_data_points': int(sum([r['data_points'] for r in results]))
         }
         
-        print(f"\n✅ {len(results)} columnas con datos válidos")
+        self.log(f"\n✅ {len(results)} columnas con datos válidos")
         
         return {
             'country': country_code,
@@ -263,36 +606,41 @@ class SupabaseRecommender:
             # Mostrar últimos 5 valores
             print(f"\n   Últimos 5 valores:")
             tail_data = item['data'].tail()
-            for _, row in tail_data.iterrows():
-                print(f"      {int(row['time'])}: {row[item['column']]}")
+            for year, value in zip(tail_data['time'].tolist(), tail_data[item['column']].tolist()):
+                print(f"      {int(year)}: {value}")
     
-    def export_json(self, result: Dict, filename: str = None):
-        """Exporta resultados a JSON"""
-        import json
-        
-        export_data = {
-            'country': result['country'],
-            'summary': result['summary'],
-            'columns': result['columns'],
-            'data': []
-        }
+    def export_json(self, result: Dict, filename: str = None, records: bool = False):
+        """
+        Exporta resultados a JSON compacto
         
-        for item in result['data']:
-            export_data['data'].append({
-                'column': item['column'],
-                'start_year': item['start_year'],
-                'end_year': item['end_year'],
-                'completeness': item['completeness'],
-                'data_points': item['data_points'],
-                'records': item['data'].to_dict('records')
-            })
+        Cada columna lleva 'time' y 'values' como arrays paralelos (format 2,
+        ver export.result_payload); records=True mantiene el layout antiguo
+        con 'records' por fila (format 1). Para varios países o formatos
+        binarios usar export_stream.
+        """
+        export_data = result_payload(result, records)
         
         if filename:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
-            print(f"\n💾 Exportado a: {filename}")
+            with open(filename, 'wb') as f:
+                f.write(dumps_json(export_data))
+            self.log(f"\n💾 Exportado a: {filename}")
         
         return export_data
+    
+    def export_stream(self, results: Iterable[Optional[Dict]], target: Union[str, BinaryIO],
+                      fmt: str = EXPORT_FORMAT, compression: Optional[str] = COMPRESSION) -> int:
+        """
+        Exporta en streaming los resultados de varios países
+        
+        Args:
+            results: resultados de get_recommendations (p. ej. un generador)
+            target: ruta o archivo binario abierto (socket.makefile('wb'), ...)
+            fmt: "json" (NDJSON), "msgpack" o "arrow"
+            compression: None, "gzip" o "brotli"
+        """
+        n = write_export(results, target, fmt, compression)
+        self.log(f"💾 {n} países exportados ({fmt}{', ' + compression if compression else ''})")
+        return n
 
 
 # ========================= 
@@ -300,7 +648,10 @@ class SupabaseRecommender:
 # ========================= 
 if __name__ == "__main__":
     # Inicializar sistema
-    recommender = SupabaseRecommender()
+    data_source = LocalDataSource.from_parquet() if DATA_BACKEND == "local" else None
+    quality_index = QualityIndex.load() if os.path.exists(QUALITY_INDEX_PATH) else None
+    cache = CountryDataCache() if data_source is None else None  # solo tiene sentido para Supabase
+    recommender = SupabaseRecommender(data_source, quality_index, cache)
     
     # Definir prioridades del usuario
     user_priorities = {
@@ -0,0 +1,302 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# =========================
+# CONFIG
+# =========================
+QUALITY_INDEX_PATH = "quality_index.parquet"
+PREFERRED_START_YEAR = 2000
+MAX_YEAR = 2025
+MIN_COMPLETENESS = 0.6
+MIN_POINTS = 5  # mínimo de puntos si la completitud es baja
+CHUNK_COLS = 64  # columnas procesadas a la vez (acota memoria)
+
+STATS = ["completeness", "start_year", "end_year", "n_points", "longest_run"]
+WINDOW_STATS = ["window_start", "window_end"]  # años de la ventana usada por el país
+
+
+def _longest_runs(notna: np.ndarray, contiguous: np.ndarray) -> np.ndarray:
+    """Largo de la racha de años consecutivos con dato que termina en cada fila"""
+    idx = np.arange(len(notna))[:, None]
+    # Una racha se corta en filas sin dato (j = i) o cuando la fila no continúa a la anterior (j = i-1)
+    breaks = np.where(~notna, idx, np.where(~contiguous[:, None], idx - 1, -1))
+    last_break = np.maximum.accumulate(breaks, axis=0)
+    return np.where(notna, idx - last_break, 0)
+
+
+def sorted_by_geo_time(df: pd.DataFrame) -> pd.DataFrame:
+    """Ordena por geo+time solo si hace falta (las fuentes ya devuelven filas ordenadas)"""
+    geo = df["geo"].astype(str).str.lower().to_numpy()
+    time = df["time"].to_numpy(dtype=np.int64)
+    if len(df) < 2 or ((geo[1:] > geo[:-1]) | ((geo[1:] == geo[:-1]) & (time[1:] >= time[:-1]))).all():
+        return df
+    return df.sort_values(["geo", "time"], kind="stable").reset_index(drop=True)
+
+
+def quality_matrices(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start_year: int,
+    end_year: int,
+    min_completeness: float,
+    min_points: int,
+) -> Dict:
+    """
+    Estadísticas (n_geos, n_columnas) sobre una tabla ordenada por geo+time.
+
+    Igual que analyze_column_quality, la ventana es el rango preferido de años
+    o, si el país no tiene filas en ese rango, todos sus años. Las filas usadas
+    de cada país son un tramo contiguo [used_start, used_end).
+    """
+    geo = df["geo"].astype(str).str.lower().to_numpy()
+    time = df["time"].to_numpy(dtype=np.int64)
+
+    geo_codes, geos = pd.factorize(geo)
+    starts = np.flatnonzero(np.r_[True, geo_codes[1:] != geo_codes[:-1]])
+    in_window = (time >= start_year) & (time <= end_year)
+
+    # Países sin filas en la ventana usan todos sus años
+    window_rows = np.add.reduceat(in_window.astype(np.int64), starts)
+    used = in_window | (window_rows[geo_codes] == 0)
+    used_rows = np.add.reduceat(used.astype(np.int64), starts)
+
+    positions = np.arange(len(df))
+    used_start = np.minimum.reduceat(np.where(used, positions, len(df)), starts)
+
+    # Fila i continúa a la i-1 (mismo país, año siguiente, ambas usadas)
+    contiguous = np.zeros(len(df), dtype=bool)
+    contiguous[1:] = (geo_codes[1:] == geo_codes[:-1]) & (time[1:] == time[:-1] + 1) & used[:-1]
+
+    # Matrices (n_geos, n_columnas); las filas están ordenadas por geo -> reduceat por tramo
+    out = {stat: [] for stat in STATS}
+    for i in range(0, len(columns), CHUNK_COLS):
+        chunk = list(columns[i:i + CHUNK_COLS])
+        notna = df[chunk].notna().to_numpy() & used[:, None]
+        years = np.where(notna, time[:, None], np.nan)
+
+        n_points = np.add.reduceat(notna.astype(np.int64), starts, axis=0)
+        out["n_points"].append(n_points)
+        out["completeness"].append(n_points / used_rows[:, None])
+        out["start_year"].append(np.fmin.reduceat(years, starts, axis=0))
+        out["end_year"].append(np.fmax.reduceat(years, starts, axis=0))
+        out["longest_run"].append(np.maximum.reduceat(_longest_runs(notna, contiguous), starts, axis=0))
+
+    matrices = {stat: np.hstack(parts) for stat, parts in out.items()}
+    usable = (matrices["completeness"] >= min_completeness) | (matrices["n_points"] >= min_points)
+    usable &= matrices["n_points"] > 0
+
+    return {
+        "geos": np.asarray(geos, dtype=object),
+        "used_start": used_start,
+        "used_end": used_start + used_rows,
+        "time": time,
+        "matrices": matrices,
+        "usable": usable,
+    }
+
+
+def build_quality_index(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+    min_completeness: float = MIN_COMPLETENESS,
+    min_points: int = MIN_POINTS,
+) -> pd.DataFrame:
+    """
+    Calcula estadísticas de calidad por (geo, columna) sobre la tabla merged.
+
+    Returns:
+        DataFrame largo con geo, column, completeness, start_year, end_year,
+        n_points, longest_run, usable y la ventana usada (window_start, window_end)
+    """
+    if columns is None:
+        columns = [c for c in df.columns if c not in ("geo", "time")]
+
+    df = df.sort_values(["geo", "time"], kind="stable").reset_index(drop=True)
+    q = quality_matrices(df, columns, start_year, end_year, min_completeness, min_points)
+    matrices, geos, time = q["matrices"], q["geos"], q["time"]
+
+    result = pd.DataFrame({
+        "geo": np.repeat(geos, len(columns)),
+        "column": np.tile(np.asarray(columns, dtype=object), len(geos)),
+        "completeness": matrices["completeness"].ravel().astype(np.float32),
+        "start_year": pd.array(matrices["start_year"].ravel(), dtype="Int32"),
+        "end_year": pd.array(matrices["end_year"].ravel(), dtype="Int32"),
+        "n_points": matrices["n_points"].ravel().astype(np.int32),
+        "longest_run": matrices["longest_run"].ravel().astype(np.int32),
+        "usable": q["usable"].ravel(),
+        "window_start": np.repeat(time[q["used_start"]], len(columns)).astype(np.int32),
+        "window_end": np.repeat(time[q["used_end"] - 1], len(columns)).astype(np.int32),
+    })
+    return result.sort_values(["geo", "column"]).reset_index(drop=True)
+
+
+def series_slice(time: np.ndarray, values: np.ndarray, start_year: int,
+                 end_year: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Puntos no nulos de una serie dentro de [start_year, end_year] (time ordenado).
+
+    Si los puntos son contiguos (el caso habitual: la serie empieza en un año
+    y no tiene huecos) se devuelven vistas de los arrays; si no, una copia
+    compacta solo de los puntos con dato.
+    """
+    lo = int(np.searchsorted(time, start_year, side="left"))
+    hi = int(np.searchsorted(time, end_year, side="right"))
+    t, v = time[lo:hi], values[lo:hi]
+
+    notna = pd.notna(v)
+    idx = np.flatnonzero(notna)
+    if len(idx) == 0:
+        return t[:0], v[:0]
+    if idx[-1] - idx[0] + 1 == len(idx):
+        return t[idx[0]:idx[-1] + 1], v[idx[0]:idx[-1] + 1]
+    return t[notna], v[notna]
+
+
+def quality_result(column: str, start_year: int, end_year: int, completeness: float,
+                   time: np.ndarray, values: np.ndarray) -> Dict:
+    """Dict de resultado de calidad (formato de analyze_column_quality) sin copiar la serie"""
+    return {
+        'column': column,
+        'start_year': start_year,
+        'end_year': end_year,
+        'completeness': completeness,
+        'data_points': len(time),
+        'data': pd.DataFrame({'time': time, column: values}, copy=False),
+    }
+
+
+def result_years(stats: Dict, min_completeness: float = MIN_COMPLETENESS) -> Tuple[int, int]:
+    """
+    Rango de años del resultado a partir de estadísticas del índice: la
+    ventana usada si la completitud alcanza el mínimo, si no los años del
+    primer y último dato (como analyze_quality).
+    """
+    if stats['completeness'] >= min_completeness and stats.get('window_start') is not None:
+        return stats['window_start'], stats['window_end']
+    return stats['start_year'], stats['end_year']
+
+
+def analyze_quality(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+    min_completeness: float = MIN_COMPLETENESS,
+    min_points: int = MIN_POINTS,
+    needed: Optional[Dict[str, Sequence[str]]] = None,
+) -> Dict[Tuple[str, str], Optional[Dict]]:
+    """
+    Análisis de calidad de varias columnas (y países) a la vez.
+
+    Mismo resultado que analyze_column_quality columna a columna: completitud
+    sobre la ventana, rango de años de la ventana (o de los puntos con dato si
+    la completitud es baja) y la serie sin nulos. Las estadísticas se calculan
+    con operaciones de arrays sobre todas las columnas; las series devueltas
+    son vistas de los arrays del frame cuando no tienen huecos.
+
+    Args:
+        needed: {geo: columnas} para construir solo esos resultados (batch);
+            None = todas las columnas de todos los países
+
+    Returns:
+        {(geo, columna): resultado o None si no hay datos suficientes}
+    """
+    columns = [c for c in columns if c in df.columns]
+    if len(df) == 0 or not columns:
+        return {}
+
+    df = sorted_by_geo_time(df)
+    q = quality_matrices(df, columns, start_year, end_year, min_completeness, min_points)
+    matrices, time = q["matrices"], df["time"].to_numpy()
+    values = {col: df[col].to_numpy() for col in columns}
+    col_index = {col: c for c, col in enumerate(columns)}
+
+    out = {}
+    for g, geo in enumerate(q["geos"]):
+        lo, hi = int(q["used_start"][g]), int(q["used_end"][g])
+        wanted = columns if needed is None else [col for col in needed.get(geo, ()) if col in col_index]
+        for col in wanted:
+            c = col_index[col]
+            if not q["usable"][g, c]:
+                out[geo, col] = None
+                continue
+
+            completeness = float(matrices["completeness"][g, c])
+            if completeness < min_completeness:
+                first, last = int(matrices["start_year"][g, c]), int(matrices["end_year"][g, c])
+            else:
+                first, last = int(time[lo]), int(time[hi - 1])
+
+            t, v = series_slice(time[lo:hi], values[col][lo:hi], first, last)
+            out[geo, col] = quality_result(col, first, last, completeness, t, v)
+    return out
+
+
+class QualityIndex:
+    """Índice (geo, columna) -> estadísticas de calidad, con lookups O(1)"""
+
+    def __init__(self, stats: pd.DataFrame):
+        self.geos: List[str] = sorted(stats["geo"].unique())
+        self.columns: List[str] = sorted(stats["column"].unique())
+        self.geo_index: Dict[str, int] = {g: i for i, g in enumerate(self.geos)}
+        self.col_index: Dict[str, int] = {c: i for i, c in enumerate(self.columns)}
+
+        rows = stats["geo"].map(self.geo_index).to_numpy()
+        cols = stats["column"].map(self.col_index).to_numpy()
+        shape = (len(self.geos), len(self.columns))
+
+        self.usable = np.zeros(shape, dtype=bool)
+        self.usable[rows, cols] = stats["usable"].to_numpy(dtype=bool)
+
+        self.arrays: Dict[str, np.ndarray] = {}
+        for stat in STATS + WINDOW_STATS:
+            arr = np.full(shape, np.nan, dtype=np.float64)
+            if stat in stats.columns:  # índices anteriores no guardan la ventana
+                arr[rows, cols] = pd.to_numeric(stats[stat], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            self.arrays[stat] = arr
+
+    @classmethod
+    def load(cls, path: str = QUALITY_INDEX_PATH) -> "QualityIndex":
+        return cls(pd.read_parquet(path))
+
+    def lookup(self, geo: str, column: str) -> Optional[Dict]:
+        """Estadísticas de una columna para un país (None si no está en el índice)"""
+        g = self.geo_index.get(geo.lower())
+        c = self.col_index.get(column)
+        if g is None or c is None:
+            return None
+
+        n_points = self.arrays["n_points"][g, c]
+        window = self.arrays["window_start"][g, c], self.arrays["window_end"][g, c]
+        return {
+            'column': column,
+            'usable': bool(self.usable[g, c]),
+            'completeness': float(self.arrays["completeness"][g, c]),
+            'start_year': None if n_points == 0 else int(self.arrays["start_year"][g, c]),
+            'end_year': None if n_points == 0 else int(self.arrays["end_year"][g, c]),
+            'n_points': int(n_points),
+            'longest_run': int(self.arrays["longest_run"][g, c]),
+            'window_start': None if np.isnan(window[0]) else int(window[0]),
+            'window_end': None if np.isnan(window[1]) else int(window[1]),
+        }
+
+    def usable_mask(self, geo: str, columns: Sequence[str]) -> np.ndarray:
+        """Máscara booleana de columnas con datos suficientes para el país"""
+        g = self.geo_index.get(geo.lower())
+        if g is None:
+            return np.zeros(len(columns), dtype=bool)
+        idx = np.array([self.col_index.get(c, -1) for c in columns], dtype=np.int64)
+        return np.where(idx >= 0, self.usable[g, np.maximum(idx, 0)], False)
+
+
+# Ejecutar desde la raíz del repo tras reconstruir la tabla merged
+if __name__ == "__main__":
+    from data.storage import MERGED_PATH, read_merged
+
+    print("Building quality index...")
+    stats = build_quality_index(read_merged(MERGED_PATH))
+    stats.to_parquet(QUALITY_INDEX_PATH, index=False)
+    print(f"Quality index saved to {QUALITY_INDEX_PATH} ({len(stats)} entries)")
@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Optional, Union
+
+# =========================
+# CONFIG
+# =========================
+SEED_BITS = 63  # semillas de request representables como int64 / JSON
+
+RngLike = Union[None, int, np.random.Generator]
+
+
+def new_seed() -> int:
+    """Semilla nueva desde la entropía del sistema (para devolverla y poder repetir la request)"""
+    return int(np.random.SeedSequence().entropy) & ((1 << SEED_BITS) - 1)
+
+
+def make_rng(rng: RngLike = None) -> np.random.Generator:
+    """
+    Generator propio de la request: un entero lo hace reproducible, None usa
+    entropía del sistema y un Generator se devuelve tal cual.
+
+    Nunca se usa el RNG global de NumPy, así dos requests concurrentes no
+    comparten estado.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def _sampling_keys(scores: np.ndarray, eligible: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Claves Gumbel: log(peso) + Gumbel(0, 1); ordenarlas de mayor a menor da
+    una muestra sin reemplazo con probabilidad proporcional al peso (igual
+    que np.random.choice(replace=False, p=...)).
+
+    Las filas sin peso positivo entre las elegibles se muestrean uniforme.
+    Las no elegibles quedan en -inf.
+    """
+    weights = np.where(eligible, np.maximum(scores, 0.0), 0.0)
+    no_weight = ~(weights > 0).any(axis=1)
+    weights[no_weight] = eligible[no_weight]
+    with np.errstate(divide="ignore"):
+        keys = np.log(weights) + rng.gumbel(size=weights.shape)
+    return np.where(weights > 0, keys, -np.inf)
+
+
+def gumbel_top_k(
+    scores: np.ndarray,
+    k: Union[int, np.ndarray],
+    rng: RngLike = None,
+    eligible: Optional[np.ndarray] = None,
+    top_n: Optional[int] = None,
+    groups: Optional[np.ndarray] = None,
+    max_per_group: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Muestreo ponderado sin reemplazo de k posiciones por fila, para muchas
+    filas (usuarios, pares país × perfil) en una sola operación de arrays.
+
+    Args:
+        scores: (n_filas, n_items) pesos no normalizados (o un vector 1D)
+        k: posiciones por fila (entero o array (n_filas,))
+        eligible: (n_filas, n_items) bool; False = el item no se puede elegir
+        top_n: solo se muestrea entre los top_n items elegibles de mayor score
+        groups: (n_items,) o (n_filas, n_items) id de grupo (p. ej. primary_label)
+        max_per_group: máximo de items elegidos por grupo en cada fila
+
+    Returns:
+        (n_filas, max(k)) índices de items en orden de selección, -1 = sin
+        item (menos elegibles que k o cupos de grupo llenos)
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    squeeze = scores.ndim == 1
+    scores = np.atleast_2d(scores)
+    n_rows, n_items = scores.shape
+    rng = make_rng(rng)
+
+    k = np.broadcast_to(np.asarray(k, dtype=np.int64), (n_rows,))
+    k_max = int(k.max()) if n_rows else 0
+    eligible = np.ones(scores.shape, dtype=bool) if eligible is None else np.atleast_2d(eligible).copy()
+    if n_items == 0:
+        out = np.full((n_rows, k_max), -1, dtype=np.int64)
+        return out[0] if squeeze else out
+
+    if top_n is not None and top_n < n_items:
+        # Candidatas: los top_n elegibles de cada fila por score (empates por posición);
+        # el muestreo se hace solo sobre esa submatriz
+        cand = np.argsort(np.where(eligible, -scores, np.inf), axis=1, kind="stable")[:, :top_n]
+        sub_groups = None
+        if groups is not None:
+            sub_groups = np.take_along_axis(np.broadcast_to(np.asarray(groups), scores.shape), cand, axis=1)
+        sub = gumbel_top_k(np.take_along_axis(scores, cand, axis=1), k, rng,
+                           np.take_along_axis(eligible, cand, axis=1), None, sub_groups, max_per_group)
+        out = np.where(sub >= 0, np.take_along_axis(cand, np.maximum(sub, 0), axis=1), -1)
+        return out[0] if squeeze else out
+
+    keys = _sampling_keys(scores, eligible, rng)
+    order = np.argsort(-keys, axis=1, kind="stable")
+    taken = np.take_along_axis(np.isfinite(keys), order, axis=1)
+
+    if groups is not None and max_per_group is not None:
+        # Recorrido greedy en orden Gumbel saltando grupos con el cupo lleno:
+        # equivale a muestrear secuencialmente excluyendo esos grupos
+        group_ids = np.broadcast_to(np.asarray(groups), scores.shape)
+        sorted_groups = np.take_along_axis(group_ids, order, axis=1)
+        codes = np.unique(sorted_groups, return_inverse=True)[1].reshape(sorted_groups.shape)
+        onehot = (codes[:, :, None] == np.arange(codes.max() + 1)[None, None, :]) & taken[:, :, None]
+        seen_before = np.take_along_axis(np.cumsum(onehot, axis=1) - onehot, codes[:, :, None], axis=2)[:, :, 0]
+        taken &= seen_before < max_per_group
+
+    taken &= np.cumsum(taken, axis=1) <= k[:, None]
+
+    # Compactar los elegidos al principio de cada fila conservando el orden
+    slot = np.argsort(~taken, axis=1, kind="stable")[:, :k_max]
+    out = np.where(np.take_along_axis(taken, slot, axis=1), np.take_along_axis(order, slot, axis=1), -1)
+    return out[0] if squeeze else out
+
+
+def weighted_sample(
+    scores: np.ndarray,
+    k: int,
+    rng: RngLike = None,
+    groups: Optional[np.ndarray] = None,
+    max_per_group: Optional[int] = None,
+) -> np.ndarray:
+    """Hasta k posiciones sin reemplazo, con probabilidad proporcional al score (un solo vector)"""
+    if len(scores) == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    picks = gumbel_top_k(scores, min(k, len(scores)), rng, groups=groups, max_per_group=max_per_group)
+    return picks[picks >= 0]
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Union
+
+from metadata_store import ColumnMetadata
+from dimensions import DimensionMap
+
+# =========================
+# CONFIG
+# =========================
+SECONDARY_WEIGHT = 0.5  # peso de las etiquetas secundarias respecto a la primaria
+TEXT_WEIGHT = 1.0  # peso de la similitud con intereses en texto libre (relativo al score máximo)
+
+
+class ScoringEngine:
+    """
+    Motor de scoring vectorizado.
+
+    Parsea la metadata una sola vez en una matriz densa columna × dimensión
+    (peso primario + 0.5 × peso secundario, escalado por confidence) y puntúa
+    las prioridades del usuario con un producto matriz-vector.
+    """
+
+    def __init__(self, metadata: Union[ColumnMetadata, pd.DataFrame], dimension_map: Optional[DimensionMap] = None):
+        """
+        Args:
+            metadata: ColumnMetadata (ver metadata_store.load_metadata) o un
+                DataFrame con el formato de column_metadata
+            dimension_map: alias de prioridades -> dimensiones; por defecto
+                dimensions.ALIASES sobre las dimensiones de la metadata
+        """
+        if isinstance(metadata, pd.DataFrame):
+            metadata = ColumnMetadata.from_frame(metadata)
+        self.store = metadata
+        self.metadata = metadata.frame()
+        self.columns: List[str] = list(metadata.columns)
+
+        self.dimensions: List[str] = list(metadata.labels)
+        self.dim_index: Dict[str, int] = dict(metadata.label_index)
+        self.dimension_map = dimension_map if dimension_map is not None else DimensionMap(self.dimensions)
+
+        # Posición de cada etiqueta del mapa en self.dimensions (-1 = no está en la metadata)
+        self._map_to_dim = np.array(
+            [self.dim_index.get(l, -1) for l in self.dimension_map.labels], dtype=np.int64
+        )
+
+        rows = np.arange(len(self.columns))
+        weights = np.zeros((len(self.columns), len(self.dimensions)), dtype=np.float64)
+        weights[rows, metadata.primary] += 1.0
+        for j in range(metadata.secondary.shape[1]):
+            valid = metadata.secondary[:, j] >= 0
+            np.add.at(weights, (rows[valid], metadata.secondary[valid, j]), SECONDARY_WEIGHT)
+
+        self.weights = weights * metadata.confidence.astype(np.float64)[:, None]
+
+    def user_vector(self, user_scores: Dict[str, float]) -> np.ndarray:
+        """
+        Normaliza las prioridades del usuario (0-1) a un vector sobre las dimensiones
+
+        Las claves se resuelven con el mapa de alias ('economic' -> 'economy',
+        'cultural' -> reparto entre varias dimensiones, ...).
+        """
+        vec = np.zeros(len(self.dimensions), dtype=np.float64)
+        if not user_scores:
+            return vec
+
+        max_score = max(user_scores.values())
+        if max_score <= 0:
+            return vec
+
+        mapped = self.dimension_map.label_vector(user_scores) / max_score
+        known = self._map_to_dim >= 0
+        vec[self._map_to_dim[known]] = mapped[known]
+        return vec
+
+    def score(self, user_scores: Dict[str, float]) -> np.ndarray:
+        """Scores de todas las columnas (en el orden de la metadata) para un usuario"""
+        return self.weights @ self.user_vector(user_scores)
+
+    def score_batch(self, profiles: Sequence[Dict[str, float]]) -> np.ndarray:
+        """
+        Puntúa varios perfiles en una sola llamada
+
+        Returns:
+            Matriz (n_perfiles, n_columnas) con los scores
+        """
+        if len(profiles) == 0:
+            return np.zeros((0, len(self.columns)), dtype=np.float64)
+        users = np.vstack([self.user_vector(p) for p in profiles])
+        return users @ self.weights.T
+
+    @staticmethod
+    def blend(scores: np.ndarray, text_scores: np.ndarray, text_weight: float = TEXT_WEIGHT) -> np.ndarray:
+        """
+        Suma la similitud con intereses en texto libre (0-1) a los scores por dimensión
+
+        La similitud se escala al score máximo del usuario, así el peso relativo
+        no depende de cuántas prioridades haya marcado.
+        """
+        scale = scores.max() if len(scores) and scores.max() > 0 else 1.0
+        return scores + text_weight * scale * text_scores
+
+    def scored_frame(self, user_scores: Dict[str, float], text_scores: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Metadata con la columna 'dynamic_score', ordenada de mayor a menor
+
+        Args:
+            text_scores: similitud (0-1) de cada columna con intereses en texto
+                libre, en el orden de self.columns (ver SemanticIndex.scores)
+        """
+        df = self.metadata.copy()
+        scores = self.score(user_scores)
+        df["dynamic_score"] = scores if text_scores is None else self.blend(scores, text_scores)
+        return df.sort_values("dynamic_score", ascending=False, kind="stable")
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from metadata_store import ColumnMetadata
+
+# =========================
+# CONFIG
+# =========================
+INDEX_PATH = "semantic_index.npy"  # matriz float32 (términos × columnas), se abre con memmap
+VOCAB_PATH = "semantic_index.json"  # columnas, vocabulario e idf
+TOP_K = 10
+MIN_TOKEN_LEN = 2
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "de", "for", "from", "in", "is", "of", "on",
+    "or", "per", "the", "to", "what", "about", "with", "how", "which", "who", "why",
+}
+
+
+def _stem(token: str) -> str:
+    """Plurales simples: 'deaths' -> 'death', 'countries' -> 'country'"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados (minúsculas, sin stopwords, plural simple)"""
+    tokens = re.findall(r"[a-z0-9]+", str(text).lower())
+    return [_stem(t) for t in tokens if len(t) >= MIN_TOKEN_LEN and t not in STOPWORDS]
+
+
+def column_text(metadata: ColumnMetadata, i: int) -> str:
+    """Texto indexado de una columna: nombre, descripción, tags y etiquetas"""
+    labels = [metadata.labels[metadata.primary[i]]] if metadata.primary[i] >= 0 else []
+    labels += metadata.secondary_labels(i)
+    return " ".join([
+        metadata.columns[i].replace("_", " "),
+        metadata.descriptions[i],
+        " ".join(metadata.tags[i]),
+        " ".join(labels),
+    ])
+
+
+class SemanticIndex:
+    """
+    Índice TF-IDF sobre la metadata de columnas para búsqueda por texto libre.
+
+    La matriz se guarda por términos (n_términos × n_columnas, float32, columnas
+    con norma L2 = 1): una consulta solo lee las filas de sus términos, así que
+    funciona igual sobre un memmap sin cargar el archivo completo.
+    """
+
+    def __init__(self, columns: Sequence[str], vocab: Dict[str, int], idf: np.ndarray, matrix: np.ndarray):
+        self.columns: List[str] = list(columns)
+        self.column_index: Dict[str, int] = {c: i for i, c in enumerate(self.columns)}
+        self.vocab = vocab
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, metadata: ColumnMetadata) -> "SemanticIndex":
+        """TF-IDF con tf sublineal (1 + log tf) e idf suavizado"""
+        docs = [Counter(tokenize(column_text(metadata, i))) for i in range(len(metadata))]
+        vocab = {term: t for t, term in enumerate(sorted(set().union(*docs)))} if docs else {}
+
+        df_counts = np.zeros(len(vocab), dtype=np.float64)
+        for doc in docs:
+            df_counts[[vocab[term] for term in doc]] += 1
+        idf = np.log((1 + len(docs)) / (1 + df_counts)) + 1.0
+
+        matrix = np.zeros((len(vocab), len(docs)), dtype=np.float32)
+        for c, doc in enumerate(docs):
+            if not doc:
+                continue
+            ids = np.array([vocab[term] for term in doc])
+            tf = 1.0 + np.log(np.fromiter(doc.values(), dtype=np.float64, count=len(doc)))
+            matrix[ids, c] = tf * idf[ids]
+
+        norms = np.linalg.norm(matrix, axis=0)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return cls(metadata.columns, vocab, idf, matrix)
+
+    def save(self, path: str = INDEX_PATH, vocab_path: str = VOCAB_PATH):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+        tmp_path = vocab_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"columns": self.columns, "vocab": self.vocab, "idf": self.idf.tolist()}, f)
+        os.replace(tmp_path, vocab_path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH, vocab_path: str = VOCAB_PATH, mmap: bool = True) -> "SemanticIndex":
+        with open(vocab_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        return cls(meta["columns"], meta["vocab"], np.asarray(meta["idf"]), matrix)
+
+    def query_vector(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids de términos, pesos L2-normalizados) de la consulta; términos desconocidos se ignoran"""
+        counts = Counter(t for t in tokenize(text) if t in self.vocab)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.array([self.vocab[t] for t in counts], dtype=np.int64)
+        weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[ids]
+        return ids, weights / np.linalg.norm(weights)
+
+    def scores(self, text: str, columns: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Similitud coseno (0-1) de la consulta con cada columna.
+
+        Args:
+            columns: orden de salida (p. ej. las columnas del ScoringEngine);
+                las que no están en el índice quedan en 0. None = orden del índice
+        """
+        ids, weights = self.query_vector(text)
+        sims = weights @ self.matrix[ids] if len(ids) else np.zeros(len(self.columns), dtype=np.float32)
+        if columns is None:
+            return sims
+        idx = np.array([self.column_index.get(c, -1) for c in columns], dtype=np.int64)
+        return np.where(idx >= 0, sims[np.maximum(idx, 0)], 0.0)
+
+    def search(self, text: str, k: int = TOP_K) -> List[Tuple[str, float]]:
+        """Las k columnas más parecidas a la consulta: [(columna, similitud), ...]"""
+        sims = self.scores(text)
+        k = min(k, int(np.count_nonzero(sims)))
+        if k == 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self.columns[i], float(sims[i])) for i in top]
+
+
+# Ejecutar desde la raíz del repo tras regenerar column_metadata
+if __name__ == "__main__":
+    import sys
+    from metadata_store import load_metadata
+
+    print("Building semantic index...")
+    index = SemanticIndex.build(load_metadata())
+    index.save()
+    print(f"Semantic index saved to {INDEX_PATH} ({index.matrix.shape[1]} columns, {index.matrix.shape[0]} terms)")
+
+    query = " ".join(sys.argv[1:]) or "child mortality"
+    for column, sim in index.search(query, 5):
+        print(f"   {sim:.3f}  {column}")
@@ -0,0 +1,210 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dimensions import normalize_key
+from metadata_store import ColumnMetadata
+
+# =========================
+# CONFIG
+# =========================
+SIMILARITY_PATH = "similarity_index.npz"
+PREFERRED_START_YEAR = 2000
+MAX_YEAR = 2025
+MIN_COVERAGE = 0.5  # fracción mínima de países con dato para usar un indicador
+MIN_SHARED = 5  # indicadores en común mínimos para comparar dos países
+MAX_NEIGHBORS = 20  # vecinos guardados por país y dimensión
+OVERALL = "overall"
+
+
+def country_features(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    start_year: int = PREFERRED_START_YEAR,
+    end_year: int = MAX_YEAR,
+    min_coverage: float = MIN_COVERAGE,
+) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Vector normalizado por país: promedio de cada indicador en la ventana,
+    convertido a percentil entre países (0-1).
+
+    El percentil hace comparables indicadores con escalas y sesgos muy
+    distintos (población, %, USD) y no depende de outliers. Los indicadores
+    con dato en menos de `min_coverage` de los países se descartan.
+
+    Returns:
+        (geos, columnas usadas, matriz float64 (n_geos, n_columnas) con NaN = sin dato)
+    """
+    columns = [c for c in columns if c in df.columns]
+    window = df[(df["time"] >= start_year) & (df["time"] <= end_year)]
+    geo = window["geo"].astype(str).str.lower()
+    means = window[columns].apply(pd.to_numeric, errors="coerce").groupby(geo.to_numpy()).mean()
+
+    coverage = means.notna().mean(axis=0)
+    means = means.loc[:, coverage >= min_coverage]
+    features = means.rank(pct=True).to_numpy(dtype=np.float64, na_value=np.nan)
+    return means.index.to_numpy(dtype=object), list(means.columns), features
+
+
+def pairwise_distances(features: np.ndarray, min_shared: int = MIN_SHARED) -> np.ndarray:
+    """
+    Distancia RMS entre países sobre los indicadores que ambos tienen.
+
+    Con máscaras M (dato presente) y X (valores con 0 en los huecos) la suma
+    de cuadrados sobre los indicadores comunes sale de productos de matrices:
+    sum M_a M_b (x_a - x_b)² = (X²)_a·M_b + M_a·(X²)_b - 2 X_a·X_b.
+    Pares con menos de `min_shared` indicadores en común quedan en inf.
+    """
+    mask = np.isfinite(features).astype(np.float64)
+    x = np.where(mask > 0, features, 0.0)
+    x2 = x * x
+
+    shared = mask @ mask.T
+    sq = x2 @ mask.T + mask @ x2.T - 2.0 * (x @ x.T)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dist = np.sqrt(np.maximum(sq, 0.0) / shared)
+    dist[shared < min_shared] = np.inf
+    np.fill_diagonal(dist, np.inf)
+    return dist
+
+
+def _nearest(dist: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Los k vecinos más cercanos de cada fila, ordenados (-1 / inf si faltan)"""
+    n = len(dist)
+    k = min(k, max(n - 1, 0))
+    if k == 0:
+        return np.zeros((n, 0), dtype=np.int32), np.zeros((n, 0), dtype=np.float32)
+    idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    d = np.take_along_axis(dist, idx, axis=1)
+    order = np.argsort(d, axis=1, kind="stable")
+    idx, d = np.take_along_axis(idx, order, axis=1), np.take_along_axis(d, order, axis=1)
+    return np.where(np.isfinite(d), idx, -1).astype(np.int32), d.astype(np.float32)
+
+
+class SimilarityIndex:
+    """
+    Vecinos más cercanos precalculados por país, en general y por dimensión.
+
+    `neighbors` y `distances` tienen forma (n_dimensiones, n_geos, MAX_NEIGHBORS):
+    la dimensión 0 usa todos los indicadores y el resto solo los de esa
+    etiqueta primaria en column_metadata (las etiquetas sin indicadores con
+    cobertura suficiente no tienen dimensión). Una consulta es un lookup.
+    """
+
+    def __init__(self, geos: Sequence[str], dimensions: Sequence[str], neighbors: np.ndarray,
+                 distances: np.ndarray, signature: Optional[Dict] = None):
+        self.geos = [str(g) for g in geos]
+        self.dimensions = list(dimensions)
+        self.geo_index: Dict[str, int] = {g: i for i, g in enumerate(self.geos)}
+        self.dim_index: Dict[str, int] = {d: i for i, d in enumerate(self.dimensions)}
+        self.neighbors = neighbors
+        self.distances = distances
+        self.signature = signature or {}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, metadata: ColumnMetadata, k: int = MAX_NEIGHBORS,
+              start_year: int = PREFERRED_START_YEAR, end_year: int = MAX_YEAR,
+              signature: Optional[Dict] = None) -> "SimilarityIndex":
+        """
+        Args:
+            signature: huella de los datos de origen (ver data_signature) para
+                saber si hace falta reconstruir
+        """
+        geos, columns, features = country_features(
+            df, [c for c in metadata.columns if c in df.columns], start_year, end_year
+        )
+        primary = np.array([metadata.primary[metadata.column_index[c]] for c in columns], dtype=np.int64)
+
+        candidates = [(OVERALL, np.ones(len(columns), dtype=bool))]
+        candidates += [(label, primary == l) for l, label in enumerate(metadata.labels)]
+
+        # Etiquetas sin indicadores usables se omiten; con menos de MIN_SHARED
+        # se exigen todos los que tiene (si no, todas las distancias serían inf)
+        dimensions, neighbors, distances = [], [], []
+        for name, subset in candidates:
+            n_columns = int(subset.sum())
+            if n_columns == 0 and name != OVERALL:
+                continue
+            nb, d = _nearest(pairwise_distances(features[:, subset], max(min(MIN_SHARED, n_columns), 1)), k)
+            dimensions.append(name)
+            neighbors.append(nb)
+            distances.append(d)
+
+        return cls(geos, dimensions, np.stack(neighbors), np.stack(distances), signature)
+
+    def save(self, path: str = SIMILARITY_PATH):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                geos=np.array(self.geos, dtype=str),
+                dimensions=np.array(self.dimensions, dtype=str),
+                neighbors=self.neighbors,
+                distances=self.distances,
+                signature=np.array(json.dumps(self.signature)),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = SIMILARITY_PATH) -> "SimilarityIndex":
+        with np.load(path) as data:
+            return cls(data["geos"].tolist(), data["dimensions"].tolist(), data["neighbors"],
+                       data["distances"], json.loads(str(data["signature"])))
+
+    def similar(self, geo: str, k: int = 5, dimension: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Los k países más parecidos: [(geo, distancia RMS en percentiles 0-1), ...]
+
+        Args:
+            dimension: etiqueta de column_metadata ('economy', 'education', ...);
+                None = todos los indicadores
+        """
+        g = self.geo_index.get(geo.lower())
+        if g is None:
+            return []
+        key = OVERALL if dimension is None else normalize_key(dimension)
+        d = self.dim_index.get(key)
+        if d is None:
+            raise ValueError(f"Dimensión desconocida: {dimension} (usar {self.dimensions})")
+
+        nb, dist = self.neighbors[d, g, :k], self.distances[d, g, :k]
+        return [(self.geos[i], float(x)) for i, x in zip(nb.tolist(), dist.tolist()) if i >= 0]
+
+
+def data_signature(*paths: str) -> Dict:
+    """Hash y tamaño de los archivos de origen (merged y metadata)"""
+    from data.merge import file_fingerprint
+
+    return {os.path.basename(p): file_fingerprint(p) for p in paths if os.path.exists(p)}
+
+
+def load_or_build(merged_path: str, metadata_path: str, path: str = SIMILARITY_PATH) -> SimilarityIndex:
+    """Carga el índice guardado; lo reconstruye solo si cambiaron la tabla merged o la metadata"""
+    from data.storage import read_merged
+    from metadata_store import load_metadata
+
+    signature = data_signature(merged_path, metadata_path)
+    if os.path.exists(path):
+        index = SimilarityIndex.load(path)
+        if index.signature == signature:
+            return index
+
+    index = SimilarityIndex.build(read_merged(merged_path), load_metadata(metadata_path), signature=signature)
+    index.save(path)
+    return index
+
+
+# Ejecutar desde la raíz del repo tras reconstruir la tabla merged
+if __name__ == "__main__":
+    import sys
+    from data.storage import MERGED_PATH
+    from metadata_store import METADATA_PATH
+
+    index = load_or_build(MERGED_PATH, METADATA_PATH)
+    print(f"Similarity index ready in {SIMILARITY_PATH} ({len(index.geos)} countries, {len(index.dimensions)} dimensions)")
+
+    geo = sys.argv[1] if len(sys.argv) > 1 else "esp"
+    for other, dist in index.similar(geo, 5):
+        print(f"   {dist:.3f}  {other}")
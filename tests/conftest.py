@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del repo son de primer nivel: ejecutar los tests desde cualquier directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+import pytest
+
+import ppp
+from benchmarks.synthetic import LatencyDataSource, make_merged, make_metadata, make_profiles
+from cache import CachedDataSource, CountryDataCache
+from data_sources import DataSource, LocalDataSource
+from instrumentation import Instrumentation
+from metadata_store import ColumnMetadata
+
+
+class _Remote(DataSource):
+    """Fuente sin tabla local detrás (como Supabase)"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def fetch(self, *args, **kwargs):
+        return self.source.fetch(*args, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def merged():
+    return make_merged(6, 60, 120, missing_rate=0.6, seed=2)
+
+
+def _recommender(source, merged):
+    columns = [c for c in merged.columns if c not in ("geo", "time")]
+    return ppp.SupabaseRecommender(source, metadata=ColumnMetadata.from_frame(make_metadata(columns)),
+                                   instrumentation=Instrumentation(verbose=False))
+
+
+@pytest.mark.parametrize("wrap", [
+    lambda s: s,
+    lambda s: LatencyDataSource(s),
+    lambda s: CachedDataSource(LatencyDataSource(s), CountryDataCache()),
+])
+def test_wrapped_local_sources_know_availability(merged, wrap):
+    recommender = _recommender(wrap(LocalDataSource(merged)), merged)
+    assert recommender.availability_known("c001")
+    assert recommender.usable_columns("zzz") == set()
+
+
+def test_remote_source_availability_unknown(merged):
+    recommender = _recommender(_Remote(LocalDataSource(merged)), merged)
+    assert not recommender.availability_known("c001")
+    assert recommender.usable_columns("c001") is None
+
+
+def test_quality_index_built_once_per_request(merged, monkeypatch):
+    calls = []
+    build = ppp.build_quality_index
+    monkeypatch.setattr(ppp, "build_quality_index", lambda *a, **k: calls.append(1) or build(*a, **k))
+    recommender = _recommender(LatencyDataSource(LocalDataSource(merged)), merged)
+    recommender.get_recommendations("c001", make_profiles(1)[0], seed=3)
+    assert len(calls) == 1
@@ -0,0 +1,18 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data import df_db
+
+
+def test_upload_empty_file_is_noop(tmp_path):
+    """Un merged_changes.parquet sin filas (corrida incremental sin cambios) no debe fallar"""
+    path = str(tmp_path / "merged_changes.parquet")
+    checkpoint_path = str(tmp_path / "upload_checkpoint.json")
+    pq.write_table(pa.table({"geo": pa.array([], pa.string()), "time": pa.array([], pa.int32()),
+                             "x": pa.array([], pa.float64())}), path)
+
+    df_db.upload(path, checkpoint_path, "wide")
+
+    assert not os.path.exists(checkpoint_path)
@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from export import PAYLOAD_FORMAT, result_payload
+
+
+def _result():
+    df = pd.DataFrame({'time': [2000, 2001, 2002], 'gdp': [1.5, np.nan, 3.0]})
+    item = {'column': 'gdp', 'start_year': 2000, 'end_year': 2002, 'completeness': 2 / 3,
+            'data_points': 3, 'data': df}
+    return {'country': 'ESP', 'summary': 'resumen', 'columns': ['gdp'], 'data': [item]}
+
+
+def test_columnar_payload_has_format():
+    payload = result_payload(_result())
+    assert payload['format'] == PAYLOAD_FORMAT == 2
+    assert payload['data'][0]['time'] == [2000, 2001, 2002]
+    assert payload['data'][0]['values'] == [1.5, None, 3.0]
+    json.dumps(payload, allow_nan=False)
+
+
+def test_records_payload_keeps_old_layout():
+    payload = result_payload(_result(), records=True)
+    assert payload['format'] == 1
+    entry = payload['data'][0]
+    assert 'time' not in entry and 'values' not in entry
+    assert entry['records'] == [{'time': 2000, 'gdp': 1.5}, {'time': 2001, 'gdp': None},
+                                {'time': 2002, 'gdp': 3.0}]
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import data_sources
+from benchmarks.synthetic import make_merged
+from data.storage import to_long, year_spans
+from data_sources import LocalDataSource, LongDataSource, SupabaseLongDataSource
+from quality_index import analyze_quality
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Subconjunto del query builder de PostgREST sobre una lista de dicts en memoria"""
+
+    def __init__(self, rows):
+        self.rows, self.orders, self.bounds = rows, [], None
+
+    def select(self, *_):
+        return self
+
+    def in_(self, col, values):
+        values = set(values)
+        self.rows = [r for r in self.rows if r[col] in values]
+        return self
+
+    def eq(self, col, value):
+        self.rows = [r for r in self.rows if r[col] == value]
+        return self
+
+    def gte(self, col, value):
+        self.rows = [r for r in self.rows if r[col] >= value]
+        return self
+
+    def lte(self, col, value):
+        self.rows = [r for r in self.rows if r[col] <= value]
+        return self
+
+    def order(self, col, desc=False):
+        self.orders.append(col)
+        return self
+
+    def range(self, lo, hi):
+        self.bounds = (lo, hi)
+        return self
+
+    def execute(self):
+        rows = sorted(self.rows, key=lambda r: tuple(r[c] for c in self.orders))
+        return _Response(rows[self.bounds[0]:self.bounds[1] + 1] if self.bounds else rows)
+
+
+class _Client:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return _Query(list(self.tables[name]))
+
+
+@pytest.fixture(scope="module")
+def sources():
+    merged = make_merged(12, 30, 40, missing_rate=0.6)
+    merged["time"] += 35  # 1995-2024: ventanas con y sin datos fuera del rango preferido
+    long_df, indicators = to_long(merged)
+    spans = year_spans(merged)
+
+    points = [{"geo": str(g), "time": int(t), "indicator": indicators[i], "value": float(v)}
+              for g, t, i, v in zip(long_df["geo"], long_df["time"], long_df["indicator"], long_df["value"])]
+    span_rows = [{"geo": g, "first_year": lo, "last_year": hi} for g, (lo, hi) in spans.items()]
+    remote = SupabaseLongDataSource.__new__(SupabaseLongDataSource)
+    remote.client = _Client({"long": points, data_sources.SPANS_TABLE: span_rows})
+    remote.table, remote.spans_table, remote.year_spans = "long", data_sources.SPANS_TABLE, None
+
+    columns = [c for c in merged.columns if c not in ("geo", "time")]
+    return merged, columns, LocalDataSource(merged), LongDataSource(long_df, indicators, spans), remote
+
+
+def _quality(df, columns):
+    if df is None:
+        return None
+    results = analyze_quality(df, columns, 2000, 2025, 0.6)
+    return {key: (r["start_year"], r["end_year"], round(r["completeness"], 9), r["data_points"])
+            for key, r in results.items() if r is not None}
+
+
+@pytest.mark.parametrize("window", [(2000, 2025), (None, None), (1990, 2005), (2020, 2030)])
+def test_long_sources_match_wide_table(sources, window):
+    """Las dos fuentes largas reconstruyen las mismas filas y la misma completitud que la tabla ancha"""
+    merged, columns, wide, local_long, remote_long = sources
+    rng = np.random.default_rng(0)
+    for geo in sorted(wide.geo_slices):
+        subset = list(rng.choice(columns, 5, replace=False))
+        expected = _quality(wide.fetch(geo, subset, *window), subset)
+        assert _quality(local_long.fetch(geo, subset, *window), subset) == expected
+        assert _quality(remote_long.fetch(geo, subset, *window), subset) == expected
+
+    geos = sorted(wide.geo_slices)[:4]
+    subset = columns[:6]
+    assert _quality(remote_long.fetch_many(geos, subset, *window), subset) == \
+        _quality(wide.fetch_many(geos, subset, *window), subset)